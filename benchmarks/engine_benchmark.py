@@ -0,0 +1,133 @@
+"""Measures the Python side of the engine path per ply, against the fake UCI engine
+
+The fake engine answers at once (unless --think-ms is given) and always
+the same way, so what is left is the bot's own overhead. A recorded game is
+played through ply by ply and every step the bot takes is timed:
+
+    send_position   playing the move and sending the position to the engine
+    search          the go command until the AnalysisResult is complete
+    ponder_hit      a ponder search turned into the result by ponderhit
+    parse_info      parsing the info lines of one search into an AnalysisResult
+    eval_message    the player's eval, WDL and material, encoded as an EVAL message
+    accuracy        recording the move and computing both accuracies
+
+Usage:
+    python benchmarks/engine_benchmark.py [--think-ms MS] [--info-depth N] [--games N] [snapshot]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import chess
+
+from fake_uci_engine import search_output
+from fake_webdriver import load_snapshot
+
+import protocol
+from accuracy import AccuracyTracker
+from engines.analysis_result import AnalysisResult
+from engines.uci_engine import UciEngine, parse_info_line
+from game_state import GameState, material_balance
+
+FAKE_ENGINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_uci_engine.py")
+
+STEPS = ["send_position", "search", "ponder_hit", "parse_info", "eval_message", "accuracy"]
+
+
+def play_game(engine, moves, info_depth, times):
+    """Play the SAN moves through the engine path, adding the time of every step to times"""
+    game = GameState()
+    tracker = AccuracyTracker()
+    engine.new_game()
+    game.send_to(engine)
+
+    for move_san in moves:
+        mover = game.board.turn
+
+        start = time.perf_counter()
+        analysis = engine.search(depth=info_depth)
+        times["search"].append(time.perf_counter() - start)
+
+        # The expected reply is pondered on, like the bot does after its own move
+        if analysis.ponder_move is not None:
+            fen, position_moves = game.uci_position()
+            engine.set_position(fen, position_moves + [analysis.best_move])
+            engine.start_search(depth=info_depth, ponder=True)
+            start = time.perf_counter()
+            engine.ponderhit()
+            engine.wait_for_result()
+            times["ponder_hit"].append(time.perf_counter() - start)
+
+        lines, _ = search_output(game.board, info_depth)
+        start = time.perf_counter()
+        result = AnalysisResult(game.board.turn)
+        for line in lines:
+            info = parse_info_line(line)
+            if info.get("multipv", 1) == 1:
+                result.update(info)
+        times["parse_info"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        is_white = mover == chess.WHITE
+        eval_value = analysis.white_score() or 0
+        if not is_white:
+            eval_value = -eval_value
+        wdl = analysis.wdl_for(is_white) or [0, 0, 0]
+        protocol.encode(
+            protocol.EVAL, protocol.SCORE_CP, eval_value, *wdl, material_balance(game.board),
+            protocol.accuracy_value(tracker.accuracy(chess.WHITE)),
+            protocol.accuracy_value(tracker.accuracy(chess.BLACK)),
+        )
+        times["eval_message"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        move_uci = game.board.parse_san(move_san).uci()
+        game.push_san(move_san)
+        game.send_to(engine)
+        times["send_position"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        tracker.add(mover, move_uci, analysis.best_move)
+        tracker.accuracy(chess.WHITE)
+        tracker.accuracy(chess.BLACK)
+        times["accuracy"].append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("snapshot", nargs="?", default="lichess_ruy_lopez", help="snapshot whose moves are played")
+    parser.add_argument("--think-ms", type=int, default=0, help="milliseconds the fake engine thinks per search")
+    parser.add_argument("--info-depth", type=int, default=12, help="info lines the fake engine sends per search")
+    parser.add_argument("--games", type=int, default=5, help="times the game is played")
+    args = parser.parse_args()
+
+    snapshot = load_snapshot(args.snapshot)
+    moves = snapshot["moves"] + snapshot["script"]
+
+    # Started through the interpreter, so it runs the same way on Windows
+    engine = UciEngine([
+        sys.executable, FAKE_ENGINE_PATH, "--think-ms", str(args.think_ms), "--info-depth", str(args.info_depth),
+    ])
+    times = {step: [] for step in STEPS}
+    try:
+        for _ in range(args.games):
+            play_game(engine, moves, args.info_depth, times)
+    finally:
+        engine.quit()
+
+    print(f"{args.games} games of {len(moves)} plies, think time {args.think_ms} ms, {args.info_depth} info lines")
+    print(f"{'step':<16}{'count':>8}{'mean us':>12}{'p50 us':>12}{'p95 us':>12}")
+    for step in STEPS:
+        times_us = sorted(t * 1e6 for t in times[step])
+        p95 = times_us[min(len(times_us) - 1, int(len(times_us) * 0.95))]
+        print(
+            f"{step:<16}{len(times_us):>8}{statistics.mean(times_us):>12.1f}"
+            f"{statistics.median(times_us):>12.1f}{p95:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""A UCI engine stand-in with deterministic output, for benchmarks of the engine path
+
+It doesn't search. The best move, the ponder move, the score and the WDL
+stats all follow from the position's Zobrist hash, so the same position
+always gets the same answer. Every search sends one info line per depth up
+to "Info Depth", then the best move after "Think Time" milliseconds (a
+ponder search only starts thinking once ponderhit arrives). stop ends a
+search at once. Both can be given on the command line and changed later as
+UCI options.
+
+Usage:
+    python benchmarks/fake_uci_engine.py [--think-ms MS] [--info-depth N]
+"""
+
+import argparse
+import sys
+import threading
+
+import chess
+import chess.polyglot
+
+DEFAULT_THINK_TIME = 0  # Milliseconds
+DEFAULT_INFO_DEPTH = 12
+
+OPTIONS = [
+    "option name Threads type spin default 1 min 1 max 1024",
+    "option name Hash type spin default 16 min 1 max 33554432",
+    "option name Ponder type check default false",
+    "option name Skill Level type spin default 20 min 0 max 20",
+    "option name Slow Mover type spin default 100 min 10 max 1000",
+    "option name UCI_ShowWDL type check default false",
+    f"option name Think Time type spin default {DEFAULT_THINK_TIME} min 0 max 600000",
+    f"option name Info Depth type spin default {DEFAULT_INFO_DEPTH} min 1 max 245",
+]
+
+
+def choose_move(board):
+    """Returns the move the engine plays in the position, None if there is none"""
+    moves = sorted(board.legal_moves, key=chess.Move.uci)
+    if not moves:
+        return None
+    return moves[chess.polyglot.zobrist_hash(board) % len(moves)]
+
+
+def score(board):
+    """Returns the centipawn score and the WDL stats of the position for the side to move"""
+    cp = chess.polyglot.zobrist_hash(board) % 301 - 150
+    win = max(0, min(1000, 300 + 2 * cp))
+    loss = max(0, min(1000 - win, 300 - 2 * cp))
+    return cp, [win, 1000 - win - loss, loss]
+
+
+def search_output(board, depth):
+    """Returns the info lines and the bestmove line of a search of the position"""
+    best_move = choose_move(board)
+    if best_move is None:
+        # Checkmate or stalemate
+        mate = "mate 0" if board.is_checkmate() else "cp 0"
+        return [f"info depth 0 score {mate}"], "bestmove (none)"
+
+    board.push(best_move)
+    ponder_move = choose_move(board)
+    board.pop()
+
+    cp, wdl = score(board)
+    pv = best_move.uci() + ("" if ponder_move is None else " " + ponder_move.uci())
+    lines = [
+        f"info depth {d} seldepth {d + 2} multipv 1 score cp {cp} wdl {wdl[0]} {wdl[1]} {wdl[2]} "
+        f"nodes {d * 1000} nps 1000000 hashfull 0 tbhits 0 time {d} pv {pv}"
+        for d in range(1, depth + 1)
+    ]
+    bestmove = f"bestmove {best_move.uci()}" + ("" if ponder_move is None else f" ponder {ponder_move.uci()}")
+    return lines, bestmove
+
+
+class FakeEngine:
+    def __init__(self, think_time=DEFAULT_THINK_TIME, info_depth=DEFAULT_INFO_DEPTH, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.board = chess.Board()
+        self.think_time = think_time
+        self.info_depth = info_depth
+        self.search_thread = None
+        self.ponderhit_event = threading.Event()
+        self.stop_event = threading.Event()
+
+    def send(self, *lines):
+        with self.output_lock:
+            for line in lines:
+                self.output.write(line + "\n")
+            self.output.flush()
+
+    def set_position(self, tokens):
+        if tokens[1] == "startpos":
+            self.board = chess.Board()
+            rest = tokens[2:]
+        else:
+            end = tokens.index("moves") if "moves" in tokens else len(tokens)
+            self.board = chess.Board(" ".join(tokens[2:end]))
+            rest = tokens[end:]
+        for move in rest[1:]:
+            self.board.push_uci(move)
+
+    def set_option(self, tokens):
+        if "value" not in tokens:
+            return
+        value_index = tokens.index("value")
+        name = " ".join(tokens[2:value_index])
+        value = " ".join(tokens[value_index + 1:])
+        if name == "Think Time":
+            self.think_time = int(value)
+        elif name == "Info Depth":
+            self.info_depth = int(value)
+
+    def go(self, tokens):
+        depth = self.info_depth
+        if "depth" in tokens:
+            depth = min(depth, int(tokens[tokens.index("depth") + 1]))
+        ponder = "ponder" in tokens
+
+        self.stop_event.clear()
+        self.ponderhit_event.clear()
+        self.search_thread = threading.Thread(target=self.search, args=(self.board.copy(), depth, ponder), daemon=True)
+        self.search_thread.start()
+
+    def search(self, board, depth, ponder):
+        lines, bestmove = search_output(board, depth)
+        self.send(*lines)
+        if ponder:
+            # Pondering lasts until the opponent's move is known
+            while not self.ponderhit_event.wait(0.01):
+                if self.stop_event.is_set():
+                    break
+        if not self.stop_event.is_set():
+            self.stop_event.wait(self.think_time / 1000)
+        self.send(bestmove)
+
+    def wait_for_search(self):
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+    def run(self, lines):
+        for line in lines:
+            tokens = line.split()
+            if not tokens:
+                continue
+            command = tokens[0]
+            if command == "uci":
+                self.send("id name Fake UCI Engine", "id author PawnBit", *OPTIONS, "uciok")
+            elif command == "isready":
+                self.send("readyok")
+            elif command == "setoption":
+                self.set_option(tokens)
+            elif command == "ucinewgame":
+                self.board = chess.Board()
+            elif command == "position":
+                self.set_position(tokens)
+            elif command == "go":
+                self.wait_for_search()
+                self.go(tokens)
+            elif command == "ponderhit":
+                self.ponderhit_event.set()
+            elif command == "stop":
+                self.stop_event.set()
+                self.wait_for_search()
+            elif command == "quit":
+                break
+        self.stop_event.set()
+        self.wait_for_search()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--think-ms", type=int, default=DEFAULT_THINK_TIME, help="milliseconds per search")
+    parser.add_argument("--info-depth", type=int, default=DEFAULT_INFO_DEPTH, help="info lines per search")
+    args = parser.parse_args()
+    FakeEngine(args.think_ms, args.info_depth).run(sys.stdin)
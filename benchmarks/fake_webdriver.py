@@ -0,0 +1,281 @@
+"""A stand-in for the Chrome WebDriver that serves a recorded page, for offline grabber benchmarks
+
+A snapshot (see snapshots/) holds what the grabbers read from a page: the
+site, the player's color, the moves shown, the moves still to come, the
+clocks, the board rectangle and whether the game is over. FakeWebDriver
+builds the few elements the grabbers look up by XPath or class from it and
+answers the grabbers' scripts the way the page would, without running them.
+
+Every command goes through execute, like on the real driver, and sleeps the
+injected latency there, so the grabbers' command counting sees it too.
+
+Recording a snapshot of a live session:
+    python benchmarks/fake_webdriver.py chesscom <chrome url> <session id> snapshot.json
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+from selenium.common import JavascriptException, NoSuchElementException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.command import Command
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from grabbers import chesscom_grabber, lichess_grabber  # noqa: E402
+from grabbers.grabber import (  # noqa: E402
+    MEASURE_BOARD_IF_DIRTY_SCRIPT,
+    MEASURE_BOARD_SCRIPT,
+    WAIT_FOR_MOVE_LIST_CHANGE_SCRIPT,
+)
+
+SNAPSHOT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+
+CHESSCOM_BOARD_XPATH = "//*[@id='board-single']"
+CHESSCOM_COORDINATES_XPATH = "//*[@id='board-single']//*[name()='svg']"
+LICHESS_BOARD_XPATH = '//*[@id="main-wrap"]/main/div[1]/div[1]/div/cg-container'
+LICHESS_NEXT_GAME_XPATH = "//*[contains(text(), 'New opponent')]"
+
+
+def load_snapshot(name):
+    """Load a snapshot by file path or by its name in the snapshots directory"""
+    path = name if os.path.exists(name) else os.path.join(SNAPSHOT_DIRECTORY, name + ".json")
+    with open(path) as file:
+        return json.load(file)
+
+
+def record_snapshot(grabber, website):
+    """Read a snapshot from the live page of an attached grabber"""
+    grabber.update_board_elem()
+    is_white = grabber.is_white()
+    geometry = grabber.get_board_geometry(is_white)
+    return {
+        "site": website,
+        "white": is_white,
+        "moves": grabber.get_move_list() or [],
+        "script": [],
+        "clocks": grabber.chrome.execute_script(
+            chesscom_grabber.GET_CLOCKS_SCRIPT if website == "chesscom" else lichess_grabber.GET_CLOCKS_SCRIPT
+        ),
+        "board_rect": {"x": geometry.x, "y": geometry.y, "width": geometry.width, "height": geometry.height},
+        "game_over": grabber.is_game_over(),
+    }
+
+
+class FakeElement:
+    """An element of the fake page, its children are found by (by, value)"""
+
+    def __init__(self, parent, attributes=None, text="", children=None):
+        self.parent = parent
+        self.attributes = attributes or {}
+        self._text = text
+        self.children = children or {}
+
+    @property
+    def text(self):
+        return self.parent.execute(Command.GET_ELEMENT_TEXT, {"id": self})["value"]
+
+    def get_attribute(self, name):
+        return self.parent.execute(Command.GET_ELEMENT_ATTRIBUTE, {"id": self, "name": name})["value"]
+
+    def find_element(self, by=By.ID, value=None):
+        return self.parent.execute(Command.FIND_CHILD_ELEMENT, {"id": self, "using": by, "value": value})["value"]
+
+    def find_elements(self, by=By.ID, value=None):
+        return self.parent.execute(Command.FIND_CHILD_ELEMENTS, {"id": self, "using": by, "value": value})["value"]
+
+
+class FakeWebDriver:
+    """Serves a snapshot to the grabbers, with latency seconds (plus up to jitter) per command"""
+
+    def __init__(self, snapshot, latency=0.0, jitter=0.0, seed=0):
+        self.site = snapshot["site"]
+        self.is_white = snapshot["white"]
+        self.moves = list(snapshot["moves"])
+        self.script = list(snapshot.get("script", []))
+        self.clocks = snapshot.get("clocks")
+        self.board_rect = snapshot["board_rect"]
+        self.game_over = snapshot.get("game_over", False)
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+        # The page state the grabbers' scripts keep on the window
+        self._processed = 0
+        self._tag_name = None
+        self._changes = []
+        self._geometry_dirty = True
+
+        self._coordinates = None
+        self._board = self._build_board()
+        self._scripts = {
+            chesscom_grabber.GET_NEW_MOVES_SCRIPT: self._chesscom_new_moves,
+            chesscom_grabber.GET_CLOCKS_SCRIPT: self._read_clocks,
+            lichess_grabber.POLL_SCRIPT: self._lichess_poll,
+            lichess_grabber.GET_CLOCKS_SCRIPT: self._read_clocks,
+            MEASURE_BOARD_SCRIPT: self._measure_board,
+            MEASURE_BOARD_IF_DIRTY_SCRIPT: lambda board_elem: self._measure_board(board_elem) if self._geometry_dirty else None,
+            "arguments[0].click();": lambda *args: None,
+        }
+
+    def _build_board(self):
+        if self.site == "chesscom":
+            # The rank numbers run down the left edge and the file letters along the bottom
+            ranks = "87654321" if self.is_white else "12345678"
+            files = "abcdefgh" if self.is_white else "hgfedcba"
+            square_names = [
+                FakeElement(self, {"x": "0.75", "y": str(3.5 + 12.5 * i)}, rank) for i, rank in enumerate(ranks)
+            ] + [
+                FakeElement(self, {"x": str(10 + 12.5 * i), "y": "99"}, file) for i, file in enumerate(files)
+            ]
+            self._coordinates = FakeElement(self, {"class": "coordinates"}, children={(By.XPATH, ".//*"): square_names})
+            return FakeElement(self, {"id": "board-single"})
+
+        ranks = FakeElement(self, {"class": "ranks" if self.is_white else "ranks black"})
+        files = FakeElement(self, {"class": "files" if self.is_white else "files black"})
+        return FakeElement(self, {"class": ""}, children={(By.XPATH, "./*"): [FakeElement(self, {"class": ""}), ranks, files]})
+
+    # Scripted page changes
+
+    def advance(self):
+        """Show the next move of the script, returns False once the script is done"""
+        if not self.script:
+            return False
+        move = self.script.pop(0)
+        self.moves.append(move)
+        self._changes.append(move)
+        if self.clocks is not None and self.clocks.get("running") is not None:
+            self.clocks["running"] = "black" if self.clocks["running"] == "white" else "white"
+        return True
+
+    def resize(self):
+        """Act as if the window was resized, the board has to be measured again"""
+        self._geometry_dirty = True
+
+    # WebDriver commands
+
+    def execute(self, driver_command, params=None):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self._random.uniform(0, self.jitter))
+
+        params = params or {}
+        if driver_command == Command.FIND_ELEMENT:
+            return {"value": self._find_element(params["using"], params["value"])}
+        if driver_command == Command.FIND_ELEMENTS:
+            return {"value": self._find_elements(params["using"], params["value"])}
+        if driver_command == Command.FIND_CHILD_ELEMENT:
+            children = params["id"].children.get((params["using"], params["value"]))
+            if not children:
+                raise NoSuchElementException(params["value"])
+            return {"value": children[0]}
+        if driver_command == Command.FIND_CHILD_ELEMENTS:
+            return {"value": list(params["id"].children.get((params["using"], params["value"]), []))}
+        if driver_command == Command.GET_ELEMENT_TEXT:
+            return {"value": params["id"]._text}
+        if driver_command == Command.GET_ELEMENT_ATTRIBUTE:
+            return {"value": params["id"].attributes.get(params["name"])}
+        if driver_command == Command.W3C_EXECUTE_SCRIPT:
+            return {"value": self._run_script(params["script"], params["args"])}
+        if driver_command == Command.W3C_EXECUTE_SCRIPT_ASYNC:
+            return {"value": self._run_async_script(params["script"], params["args"])}
+        raise NotImplementedError(driver_command)
+
+    def _find_element(self, by, value):
+        elements = self._find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(value)
+        return elements[0]
+
+    def _find_elements(self, by, value):
+        if by == By.XPATH and value == (CHESSCOM_BOARD_XPATH if self.site == "chesscom" else LICHESS_BOARD_XPATH):
+            return [self._board]
+        if self.site == "chesscom" and by == By.XPATH and value == CHESSCOM_COORDINATES_XPATH:
+            return [self._coordinates]
+        if self.game_over and self.site == "chesscom" and by == By.CLASS_NAME and value == "board-modal-container":
+            return [FakeElement(self, {"class": "board-modal-container"})]
+        if self.game_over and self.site == "lichess" and by == By.XPATH and value == LICHESS_NEXT_GAME_XPATH:
+            return [FakeElement(self, text="New opponent")]
+        return []
+
+    def execute_script(self, script, *args):
+        return self.execute(Command.W3C_EXECUTE_SCRIPT, {"script": script, "args": list(args)})["value"]
+
+    def execute_async_script(self, script, *args):
+        return self.execute(Command.W3C_EXECUTE_SCRIPT_ASYNC, {"script": script, "args": list(args)})["value"]
+
+    def find_element(self, by=By.ID, value=None):
+        return self.execute(Command.FIND_ELEMENT, {"using": by, "value": value})["value"]
+
+    def find_elements(self, by=By.ID, value=None):
+        return self.execute(Command.FIND_ELEMENTS, {"using": by, "value": value})["value"]
+
+    # The grabbers' scripts, answered from the snapshot
+
+    def _run_script(self, script, args):
+        handler = self._scripts.get(script)
+        if handler is not None:
+            return handler(*args)
+        if script.startswith("lichess.socket.ws.send"):
+            return None
+        raise JavascriptException(f"The fake page doesn't know the script: {script[:60]!r}")
+
+    def _run_async_script(self, script, args):
+        if script != WAIT_FOR_MOVE_LIST_CHANGE_SCRIPT:
+            raise JavascriptException(f"The fake page doesn't know the script: {script[:60]!r}")
+        # Nothing changes the page while the grabber waits, so the whole timeout passes
+        if not self._changes:
+            time.sleep(args[1] / 1000)
+        changes = self._changes
+        self._changes = []
+        return {"changes": changes, "geometryDirty": self._geometry_dirty}
+
+    def _chesscom_new_moves(self, all_moves):
+        first = 0 if all_moves else self._processed
+        self._processed = len(self.moves)
+        return {
+            "count": len(self.moves),
+            "moves": [[str(i), move] for i, move in enumerate(self.moves) if i >= first],
+            "geometryDirty": self._geometry_dirty,
+        }
+
+    def _lichess_poll(self, all_moves):
+        result = {
+            "page": "fake",
+            "puzzles": False,
+            "gameOver": self.game_over,
+            "tagName": self._tag_name,
+            "moves": [],
+            "noMoves": False,
+            "geometryDirty": self._geometry_dirty,
+        }
+        if not self.moves:
+            result["noMoves"] = True
+            return result
+        self._tag_name = result["tagName"] = "kwdb"
+
+        first = 0 if all_moves else self._processed
+        self._processed = len(self.moves)
+        result["moves"] = [[f"fake:{i}", move] for i, move in enumerate(self.moves) if i >= first]
+        return result
+
+    def _read_clocks(self):
+        return None if self.clocks is None else dict(self.clocks)
+
+    def _measure_board(self, board_elem):
+        self._geometry_dirty = False
+        return dict(self.board_rect)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 5:
+        print("Usage: python benchmarks/fake_webdriver.py <chesscom|lichess> <chrome url> <session id> <output>")
+        sys.exit(1)
+
+    website, chrome_url, chrome_session_id, output = sys.argv[1:]
+    grabber_class = chesscom_grabber.ChesscomGrabber if website == "chesscom" else lichess_grabber.LichessGrabber
+    snapshot = record_snapshot(grabber_class(chrome_url, chrome_session_id), website)
+    with open(output, "w") as file:
+        json.dump(snapshot, file, indent=4)
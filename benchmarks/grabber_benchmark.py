@@ -0,0 +1,87 @@
+"""Measures the WebDriver round-trips and the wall time of the grabber calls, fully offline
+
+The grabbers run against FakeWebDriver serving the recorded snapshots, with
+the given latency injected into every command. Between calls a move of the
+snapshot's script is played now and then, so the move reads see new moves.
+
+Usage:
+    python benchmarks/grabber_benchmark.py [--latency MS] [--jitter MS] [--iterations N] [snapshot ...]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from fake_webdriver import SNAPSHOT_DIRECTORY, FakeWebDriver, load_snapshot
+
+from grabbers.chesscom_grabber import ChesscomGrabber
+from grabbers.lichess_grabber import LichessGrabber
+
+GRABBERS = {
+    "chesscom": ChesscomGrabber,
+    "lichess": LichessGrabber,
+}
+
+# The grabber calls measured, "poll" is one pass of the bot's wait for the opponent's move
+CALLS = [
+    ("get_move_list", lambda grabber, driver: grabber.get_move_list()),
+    ("is_game_over", lambda grabber, driver: grabber.is_game_over()),
+    ("is_white", lambda grabber, driver: grabber.is_white()),
+    ("get_clocks", lambda grabber, driver: grabber.get_clocks()),
+    ("get_board_geometry", lambda grabber, driver: grabber.get_board_geometry(driver.is_white)),
+    ("poll", lambda grabber, driver: (grabber.is_game_over(), grabber.get_move_list())),
+]
+
+
+def benchmark(snapshot, call, iterations, latency, jitter, move_every):
+    """Returns the wall times of the calls and the WebDriver commands they sent"""
+    driver = FakeWebDriver(snapshot, latency, jitter)
+    grabber = GRABBERS[snapshot["site"]](None, None, driver)
+    grabber.update_board_elem()
+    # The bot reads all the moves once when it starts
+    grabber.get_move_list()
+    grabber.command_stats.take_report()
+
+    times = []
+    commands = 0
+    for i in range(iterations):
+        if move_every and i % move_every == move_every - 1:
+            driver.advance()
+        start = time.perf_counter()
+        call(grabber, driver)
+        times.append(time.perf_counter() - start)
+        commands += grabber.command_stats.take_report()[0]
+    return times, commands
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("snapshots", nargs="*", help="snapshot names or paths, all recorded snapshots by default")
+    parser.add_argument("--latency", type=float, default=2.0, help="milliseconds added to every WebDriver command")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more milliseconds per command")
+    parser.add_argument("--iterations", type=int, default=200, help="calls measured per grabber call")
+    parser.add_argument("--move-every", type=int, default=4, help="calls between the moves played on the page")
+    args = parser.parse_args()
+
+    names = args.snapshots or sorted(name[:-5] for name in os.listdir(SNAPSHOT_DIRECTORY) if name.endswith(".json"))
+
+    print(f"latency {args.latency} ms, jitter {args.jitter} ms, {args.iterations} calls each")
+    print(f"{'snapshot':<22}{'call':<20}{'round-trips/call':>18}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name in names:
+        snapshot = load_snapshot(name)
+        for call_name, call in CALLS:
+            times, commands = benchmark(
+                snapshot, call, args.iterations, args.latency / 1000, args.jitter / 1000, args.move_every
+            )
+            times_ms = sorted(t * 1000 for t in times)
+            p95 = times_ms[min(len(times_ms) - 1, int(len(times_ms) * 0.95))]
+            print(
+                f"{name:<22}{call_name:<20}{commands / len(times):>18.2f}"
+                f"{statistics.mean(times_ms):>10.3f}{statistics.median(times_ms):>10.3f}{p95:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
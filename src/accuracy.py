@@ -0,0 +1,47 @@
+import threading
+
+import chess
+
+
+def accuracy_percentage(played_moves, best_moves):
+    """Returns the percentage of played moves that match the best moves, None if there are none"""
+    if len(played_moves) == 0:
+        return None
+    matches = sum(1 for played, best in zip(played_moves, best_moves) if played == best)
+    return matches / len(played_moves) * 100
+
+
+def format_accuracy(accuracy):
+    return "-" if accuracy is None else f"{accuracy:.1f}%"
+
+
+class AccuracyTracker:
+    """Keeps the played and the best moves of both sides
+
+    The best move of an entry can be filled in later from another thread,
+    until then the entry doesn't count towards the accuracy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {chess.WHITE: [], chess.BLACK: []}
+
+    def reset(self):
+        with self._lock:
+            self._entries = {chess.WHITE: [], chess.BLACK: []}
+
+    def add(self, color, played_move, best_move=None):
+        """Record a played move, returns the entry to resolve if the best move isn't known yet"""
+        entry = [played_move, best_move]
+        with self._lock:
+            self._entries[color].append(entry)
+        return entry
+
+    def resolve(self, entry, best_move):
+        with self._lock:
+            entry[1] = best_move
+
+    def accuracy(self, color):
+        with self._lock:
+            resolved = [entry for entry in self._entries[color] if entry[1] is not None]
+        return accuracy_percentage([entry[0] for entry in resolved], [entry[1] for entry in resolved])
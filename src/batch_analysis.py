@@ -0,0 +1,156 @@
+"""Analyse finished games from PGN files without the browser or the GUI
+
+The games are read one at a time and handed to a pool of worker processes,
+each with its own single-threaded engine, so the throughput grows with the
+number of workers. Every move gets the metrics the bot shows after a move:
+the engine's evaluation and WDL stats and the material balance of the
+position after it, and both sides' accuracies so far. The best move is the
+engine's choice in the position before it. Scores and WDL stats are from
+white's point of view. The rows are written as JSON lines or CSV, in game order.
+
+Usage (from src):
+    python batch_analysis.py --engine <stockfish> [--workers N] [--depth D | --movetime MS]
+                             [--format jsonl|csv] [--output FILE] <pgn> [<pgn> ...]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import chess
+import chess.pgn
+import multiprocess
+
+from accuracy import AccuracyTracker
+from engines.uci_engine import UciEngine
+from game_state import GameState, material_balance
+
+FIELDS = [
+    "game", "white_player", "black_player", "ply", "color", "move", "best_move",
+    "score_type", "score", "win", "draw", "loss", "material", "white_accuracy", "black_accuracy",
+]
+
+# The engine of a worker process, started by start_worker
+_engine = None
+
+
+def start_worker(engine_path, parameters):
+    global _engine
+    _engine = UciEngine(engine_path, parameters)
+
+
+def read_games(paths, depth, movetime):
+    """Yields a job for every game of the PGN files, reading them one game at a time"""
+    index = 0
+    for path in paths:
+        with open(path, encoding="utf-8-sig", errors="replace") as file:
+            while True:
+                game = chess.pgn.read_game(file)
+                if game is None:
+                    break
+                index += 1
+                board = game.board()
+                fen = None if board.fen() == chess.STARTING_FEN else board.fen()
+                moves = [move.uci() for move in game.mainline_moves()]
+                yield index, game.headers.get("White", "?"), game.headers.get("Black", "?"), fen, moves, depth, movetime
+
+
+def analyse_game(job):
+    """Search every position of a game, returns the rows of its moves"""
+    index, white_player, black_player, fen, moves, depth, movetime = job
+    game = GameState(fen=fen)
+    tracker = AccuracyTracker()
+    _engine.new_game()
+    game.send_to(_engine)
+    analysis = _engine.search(depth=depth, movetime=movetime)
+
+    rows = []
+    for ply, move_uci in enumerate(moves, start=1):
+        mover = game.board.turn
+        best_move_san = None
+        if analysis.best_move is not None:
+            best_move_san = game.board.san(chess.Move.from_uci(analysis.best_move))
+        tracker.add(mover, move_uci, analysis.best_move)
+        move_san = game.push_uci(move_uci)
+        game.send_to(_engine)
+
+        # The search of the position after the move is its evaluation and gives the next best move
+        analysis_after = _engine.search(depth=depth, movetime=movetime)
+        wdl = analysis_after.wdl_for(chess.WHITE) or [None, None, None]
+        rows.append({
+            "game": index,
+            "white_player": white_player,
+            "black_player": black_player,
+            "ply": ply,
+            "color": "white" if mover == chess.WHITE else "black",
+            "move": move_san,
+            "best_move": best_move_san,
+            "score_type": analysis_after.score_type,
+            "score": analysis_after.white_score(),
+            "win": wdl[0],
+            "draw": wdl[1],
+            "loss": wdl[2],
+            "material": material_balance(game.board),
+            "white_accuracy": tracker.accuracy(chess.WHITE),
+            "black_accuracy": tracker.accuracy(chess.BLACK),
+        })
+        analysis = analysis_after
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pgn", nargs="+", help="PGN files of the games")
+    parser.add_argument("--engine", required=True, help="path of the Stockfish executable")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="engine processes, one per core by default")
+    parser.add_argument("--depth", type=int, default=None, help="search depth per position (15 if no movetime)")
+    parser.add_argument("--movetime", type=int, default=None, help="milliseconds per position")
+    parser.add_argument("--hash", type=int, default=16, help="hash size of every engine in MB")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--output", default=None, help="file the rows are written to, stdout by default")
+    args = parser.parse_args()
+
+    depth = args.depth
+    if depth is None and args.movetime is None:
+        depth = 15
+
+    # Every worker gets a core, more threads per engine would only compete with the other workers
+    parameters = {"Threads": 1, "Hash": args.hash}
+
+    output = sys.stdout if args.output is None else open(args.output, "w", newline="")
+    writer = None
+    if args.format == "csv":
+        writer = csv.DictWriter(output, fieldnames=FIELDS)
+        writer.writeheader()
+
+    games = 0
+    positions = 0
+    start = time.monotonic()
+    try:
+        with multiprocess.Pool(args.workers, initializer=start_worker, initargs=(args.engine, parameters)) as pool:
+            # Results come back in game order while later games are still being analysed
+            for rows in pool.imap(analyse_game, read_games(args.pgn, depth, args.movetime)):
+                for row in rows:
+                    if writer is not None:
+                        writer.writerow(row)
+                    else:
+                        output.write(json.dumps(row) + "\n")
+                games += 1
+                # The final position of every game is searched as well
+                positions += len(rows) + 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.monotonic() - start
+    print(
+        f"{games} games, {positions} positions in {elapsed:.1f} s ({positions / max(elapsed, 1e-9):.1f} positions/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
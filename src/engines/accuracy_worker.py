@@ -0,0 +1,42 @@
+import queue
+import threading
+
+
+class AccuracyWorker(threading.Thread):
+    """Finds the best move of positions where a move was already played
+
+    The searches run on an engine pool instead of the main engine, so the
+    main search never waits for them. Each result resolves an
+    AccuracyTracker entry, then on_update is called from this thread.
+    """
+
+    def __init__(self, engine_pool, session_id, tracker, on_update, movetime=300):
+        super().__init__(daemon=True)
+        self.engine_pool = engine_pool
+        self.session_id = session_id
+        self.tracker = tracker
+        self.on_update = on_update
+        self.movetime = movetime
+        self.jobs = queue.Queue()
+
+    def submit(self, fen, moves, entry):
+        """Queue the position (as sent to the engine) the entry's move was played in"""
+        self.jobs.put((fen, moves, entry))
+
+    def close(self):
+        self.jobs.put(None)
+
+    def run(self):
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+
+                fen, moves, entry = job
+                best_move = self.engine_pool.analyse(self.session_id, fen, moves, movetime=self.movetime).best_move
+                self.tracker.resolve(entry, best_move)
+                self.on_update()
+        except Exception as e:
+            # The pool is gone (closed or its server stopped)
+            print(f"Accuracy analysis stopped: {e}")
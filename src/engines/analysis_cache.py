@@ -0,0 +1,52 @@
+import collections
+import threading
+
+
+class AnalysisCache:
+    """Keeps AnalysisResults by position (Zobrist hash), dropping the least recently used
+
+    A cached result is only handed out if it was searched at least as deep
+    as the caller asks for, and a shallower result never replaces a deeper one.
+    A parent cache (e.g. a proxy of the one the engine pool server keeps) is
+    asked on a miss and gets every new result, so results outlive the process.
+    """
+
+    def __init__(self, max_entries=100000, parent=None):
+        self.max_entries = max_entries
+        self.parent = parent
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, depth):
+        """Returns the cached result for the position if it is deep enough, otherwise None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None and result.depth >= depth:
+                self._entries.move_to_end(key)
+                return result
+
+        if self.parent is None:
+            return None
+        result = self.parent.get(key, depth)
+        if result is not None:
+            self._store(key, result)
+        return result
+
+    def put(self, key, result):
+        if result.best_move is None:
+            return
+        self._store(key, result)
+        if self.parent is not None:
+            self.parent.put(key, result)
+
+    def _store(self, key, result):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached.depth <= result.depth:
+                self._entries[key] = result
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
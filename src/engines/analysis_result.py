@@ -0,0 +1,48 @@
+class AnalysisResult:
+    """The outcome of a single engine search of one position
+
+    The score and the WDL stats are kept the way the engine reports them,
+    from the point of view of the side to move (turn is True for white).
+    """
+
+    def __init__(self, turn=True):
+        self.turn = turn
+        self.best_move = None
+        self.ponder_move = None
+        self.score_type = None
+        self.score_value = None
+        self.wdl = None
+        self.depth = 0
+        self.nodes = 0
+        self.nps = 0
+        self.pv = []
+
+    def update(self, info):
+        """Fold a parsed "info" line into the result"""
+        # Bound scores from aspiration windows are only a fallback
+        if "score" in info and ("bound" not in info or self.score_type is None):
+            self.score_type = info["score"]["type"]
+            self.score_value = info["score"]["value"]
+            self.wdl = info.get("wdl", self.wdl)
+        for key in ("depth", "nodes", "nps"):
+            if key in info:
+                setattr(self, key, info[key])
+        if info.get("pv"):
+            self.pv = info["pv"]
+
+    def has_score(self):
+        return self.score_type is not None
+
+    def white_score(self):
+        """Returns the score from white's perspective"""
+        if self.score_value is None:
+            return None
+        return self.score_value if self.turn else -self.score_value
+
+    def wdl_for(self, color):
+        """Returns the [win, draw, loss] stats from the given color's perspective"""
+        if self.wdl is None:
+            return None
+        if color == self.turn:
+            return list(self.wdl)
+        return list(reversed(self.wdl))
@@ -0,0 +1,122 @@
+import collections
+import threading
+from contextlib import contextmanager
+
+from multiprocess.managers import BaseManager
+
+from engines.analysis_cache import AnalysisCache
+from engines.uci_engine import UciEngine
+
+
+class EnginePool:
+    """A fixed set of engine processes shared by several sessions
+
+    The Threads and Hash budgets are split evenly between the engines.
+    Sessions get an engine in the order they asked for one, and an engine
+    that last served a different session gets a ucinewgame first, so no
+    search state leaks from one session into another.
+    """
+
+    def __init__(self, path, size, threads, hash_mb, parameters=None):
+        engine_parameters = dict(parameters or {})
+        engine_parameters["Threads"] = max(1, threads // size)
+        engine_parameters["Hash"] = max(16, hash_mb // size)
+
+        # Raises PermissionError/OSError if the executable can't be started
+        self._engines = [UciEngine(path, engine_parameters) for _ in range(size)]
+        self._idle = list(self._engines)
+        self._last_session = {engine: None for engine in self._engines}
+        self._waiting = collections.deque()
+        self._condition = threading.Condition()
+
+    def size(self):
+        return len(self._engines)
+
+    def _check_out(self, session_id):
+        with self._condition:
+            ticket = object()
+            self._waiting.append(ticket)
+            while self._waiting[0] is not ticket or not self._idle:
+                self._condition.wait()
+            self._waiting.popleft()
+
+            # An engine that already served this session still has its hash warm
+            engine = next((e for e in self._idle if self._last_session[e] == session_id), self._idle[0])
+            self._idle.remove(engine)
+            self._condition.notify_all()
+
+        if self._last_session[engine] != session_id:
+            engine.new_game()
+            self._last_session[engine] = session_id
+        return engine
+
+    def _check_in(self, engine):
+        with self._condition:
+            self._idle.append(engine)
+            self._condition.notify_all()
+
+    @contextmanager
+    def acquire(self, session_id):
+        """Borrow an engine for the given session"""
+        engine = self._check_out(session_id)
+        try:
+            yield engine
+        finally:
+            # Don't hand over an engine that is still searching
+            engine.stop()
+            self._check_in(engine)
+
+    def analyse(self, session_id, fen=None, moves=None, depth=None, movetime=None, nodes=None):
+        """Search a position on the next free engine, returns an AnalysisResult"""
+        with self.acquire(session_id) as engine:
+            engine.set_position(fen, moves)
+            return engine.search(depth=depth, movetime=movetime, nodes=nodes)
+
+    def end_session(self, session_id):
+        """Forget the session, so its engines start a new game for whoever comes next"""
+        with self._condition:
+            for engine, last_session in self._last_session.items():
+                if last_session == session_id:
+                    self._last_session[engine] = None
+
+    def close(self):
+        for engine in self._engines:
+            engine.quit()
+
+
+# The pool and the analysis cache living in the manager's server process
+_served_pool = None
+_served_cache = AnalysisCache()
+
+
+def _create_served_pool(path, size, threads, hash_mb, parameters):
+    global _served_pool
+    _served_pool = EnginePool(path, size, threads, hash_mb, parameters)
+
+
+def _get_served_pool():
+    return _served_pool
+
+
+def _get_served_cache():
+    return _served_cache
+
+
+class EnginePoolManager(BaseManager):
+    """Serves one EnginePool and one AnalysisCache to every process holding their proxies"""
+
+
+EnginePoolManager.register("get_pool", callable=_get_served_pool)
+EnginePoolManager.register("get_analysis_cache", callable=_get_served_cache)
+
+
+def start_engine_pool_server(path, size, threads, hash_mb, parameters=None):
+    """Start the pool in its own process, returns the manager (shutdown() stops it) and the pool proxy
+
+    The proxy can be handed to other processes, its analyse and end_session
+    calls are served by the shared pool. manager.get_analysis_cache() gives
+    a proxy of the cache that outlives the bot processes.
+    """
+    manager = EnginePoolManager()
+    manager.start(_create_served_pool, (path, size, threads, hash_mb, parameters))
+    return manager, manager.get_pool()
@@ -0,0 +1,23 @@
+import chess.polyglot
+
+
+class OpeningBook:
+    """A Polyglot .bin opening book
+
+    The book file is memory-mapped and its entries (sorted by Zobrist key)
+    are found with a binary search, so a lookup doesn't read the whole book.
+    """
+
+    def __init__(self, path):
+        # Raises OSError if the book can't be opened
+        self._reader = chess.polyglot.open_reader(path)
+
+    def choose_move(self, board):
+        """Pick one of the book moves of the position at random by their weights, None if out of book"""
+        try:
+            return self._reader.weighted_choice(board).move.uci()
+        except IndexError:
+            return None
+
+    def close(self):
+        self._reader.close()
@@ -0,0 +1,205 @@
+import mmap
+import os
+import struct
+import sys
+
+import chess
+
+from engines.analysis_result import AnalysisResult
+
+# File header: magic, format version, capacity (a power of two), record count
+HEADER = struct.Struct("<4sIQQ")
+MAGIC = b"PBPS"
+VERSION = 1
+
+# Record: zobrist key, best move, ponder move, score, depth, flags, win/draw/loss
+RECORD = struct.Struct("<QHHhBBHHH2x")
+
+FLAG_SCORE = 1
+FLAG_MATE = 2
+FLAG_WDL = 4
+
+PROMOTIONS = [None, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]
+
+
+def pack_move(uci):
+    """Packs a UCI move into 15 bits, 0 means no move"""
+    if uci is None:
+        return 0
+    move = chess.Move.from_uci(uci)
+    return move.from_square | move.to_square << 6 | PROMOTIONS.index(move.promotion) << 12
+
+
+def unpack_move(packed):
+    if packed == 0:
+        return None
+    return chess.Move(packed & 63, packed >> 6 & 63, PROMOTIONS[packed >> 12 & 7]).uci()
+
+
+def pack_result(key, result):
+    flags = 0
+    score = 0
+    if result.score_type is not None:
+        flags |= FLAG_SCORE
+        if result.score_type == "mate":
+            flags |= FLAG_MATE
+        score = max(-32767, min(32767, result.score_value))
+    wdl = (0, 0, 0)
+    if result.wdl is not None:
+        flags |= FLAG_WDL
+        wdl = result.wdl
+    return RECORD.pack(
+        key, pack_move(result.best_move), pack_move(result.ponder_move),
+        score, min(255, result.depth), flags, *wdl,
+    )
+
+
+def unpack_result(record, turn):
+    """Returns the key and the AnalysisResult of a packed record"""
+    key, best_move, ponder_move, score, depth, flags, win, draw, loss = RECORD.unpack(record)
+    result = AnalysisResult(turn)
+    result.best_move = unpack_move(best_move)
+    result.ponder_move = unpack_move(ponder_move)
+    result.depth = depth
+    if flags & FLAG_SCORE:
+        result.score_type = "mate" if flags & FLAG_MATE else "cp"
+        result.score_value = score
+    if flags & FLAG_WDL:
+        result.wdl = [win, draw, loss]
+    result.pv = [move for move in (result.best_move, result.ponder_move) if move is not None]
+    return key, result
+
+
+class PositionStore:
+    """Engine results of earlier sessions, kept in a memory-mapped file
+
+    The file is an open-addressing hash table of fixed-size records keyed
+    by the Zobrist hash. It is mapped read-only, so opening it costs the
+    same however big it is and every bot process shares the same pages.
+    New results are appended to a journal next to it and only get into the
+    table when compact() is run while no bot has the file open.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self._file = None
+        self._map = None
+        self._capacity = 0
+        self._journal = None
+
+        try:
+            self._file = open(path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self._capacity, _ = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION or len(self._map) < HEADER.size + self._capacity * RECORD.size:
+                self._close_map()
+        except (OSError, ValueError, struct.error):
+            # Missing, empty or broken, start with an empty table
+            self._close_map()
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+        self._map = None
+        self._file = None
+        self._capacity = 0
+
+    def get(self, key, depth, turn=chess.WHITE):
+        """Returns the stored result for the position if it is deep enough, otherwise None"""
+        if self._capacity == 0:
+            return None
+
+        mask = self._capacity - 1
+        index = key & mask
+        while True:
+            offset = HEADER.size + index * RECORD.size
+            record_key = struct.unpack_from("<Q", self._map, offset)[0]
+            if record_key == 0:
+                return None
+            if record_key == key:
+                if self._map[offset + 14] < depth:
+                    return None
+                return unpack_result(self._map[offset:offset + RECORD.size], turn)[1]
+            index = (index + 1) & mask
+
+    def put(self, key, result):
+        """Append a result to the journal, it is looked up after the next compaction"""
+        if result.best_move is None:
+            return
+        if self._journal is None:
+            self._journal = open(self.journal_path, "ab")
+        self._journal.write(pack_result(key, result))
+        self._journal.flush()
+
+    def close(self):
+        self._close_map()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+def _read_records(data, offset):
+    for start in range(offset, len(data) - RECORD.size + 1, RECORD.size):
+        record = data[start:start + RECORD.size]
+        if struct.unpack_from("<Q", record)[0] != 0:
+            yield record
+
+
+def compact(path):
+    """Merge the journal into the table, keeping the deepest result of every position
+
+    Must only run while no bot has the store open. Returns the number of positions.
+    """
+    journal_path = path + ".journal"
+    records = {}
+
+    sources = []
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) >= HEADER.size and HEADER.unpack_from(data)[:2] == (MAGIC, VERSION):
+            sources.append(_read_records(data, HEADER.size))
+    if os.path.exists(journal_path):
+        with open(journal_path, "rb") as f:
+            sources.append(_read_records(f.read(), 0))
+
+    for source in sources:
+        for record in source:
+            key = struct.unpack_from("<Q", record)[0]
+            previous = records.get(key)
+            # Depth is the byte after key and the two moves and the score
+            if previous is None or previous[14] <= record[14]:
+                records[key] = record
+
+    # Keep the table at most half full so probe chains stay short
+    capacity = 1024
+    while capacity < len(records) * 2:
+        capacity *= 2
+
+    table = bytearray(HEADER.size + capacity * RECORD.size)
+    HEADER.pack_into(table, 0, MAGIC, VERSION, capacity, len(records))
+    mask = capacity - 1
+    for key, record in records.items():
+        index = key & mask
+        while struct.unpack_from("<Q", table, HEADER.size + index * RECORD.size)[0] != 0:
+            index = (index + 1) & mask
+        offset = HEADER.size + index * RECORD.size
+        table[offset:offset + RECORD.size] = record
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(table)
+    os.replace(temp_path, path)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+    return len(records)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "compact":
+        print("usage (from src): python -m engines.position_store compact <path>")
+        sys.exit(1)
+    print(f"{compact(sys.argv[2])} positions")
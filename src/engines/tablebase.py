@@ -0,0 +1,81 @@
+import chess
+import chess.syzygy
+
+from engines.analysis_result import AnalysisResult
+
+# Tablebase wins are reported like the engine does, as a centipawn score far above any evaluation
+TB_WIN_SCORE = 20000
+
+
+class Tablebase:
+    """Syzygy tablebases of a user supplied directory
+
+    Positions with few enough pieces are resolved exactly: the best move
+    keeps the best WDL outcome and, within it, wins by the shortest DTZ or
+    loses by the longest one. The outcomes take the 50 move rule into account,
+    a win or loss that can't reach a capture or pawn move before the halfmove
+    clock runs out is a draw.
+    """
+
+    def __init__(self, directory):
+        self._tablebase = chess.syzygy.Tablebase()
+        self._tablebase.add_directory(directory)
+
+        # Table names look like KQvKR, so the piece count is the name length without the "v"
+        self.max_pieces = max((len(name) - 1 for name in self._tablebase.wdl), default=0)
+
+    def probe(self, board):
+        """Returns an AnalysisResult with the best move and the exact outcome, None if not in the tables"""
+        if chess.popcount(board.occupied) > self.max_pieces or board.castling_rights:
+            return None
+
+        try:
+            wdl = self._tablebase.probe_wdl(board)
+            dtz = self._tablebase.probe_dtz(board)
+            # The tables count from a halfmove clock of 0
+            if abs(wdl) == 2 and board.halfmove_clock + abs(dtz) > 100:
+                wdl //= 2
+
+            best_move, best_key = None, None
+            for move in board.legal_moves:
+                # A capture or pawn move resets the halfmove clock, so it is always DTZ-optimal
+                zeroing = board.is_zeroing(move)
+                board.push(move)
+                try:
+                    if board.is_checkmate():
+                        key = (2, 2, 0)
+                    else:
+                        move_wdl = -self._tablebase.probe_wdl(board)
+                        move_dtz = abs(self._tablebase.probe_dtz(board))
+                        if not zeroing and abs(move_wdl) == 2 and board.halfmove_clock + move_dtz > 100:
+                            move_wdl //= 2
+                        # Shortest way to a win, longest way to a loss
+                        key = (move_wdl, int(zeroing and move_wdl > 0), -move_dtz if move_wdl > 0 else move_dtz)
+                finally:
+                    board.pop()
+                if best_key is None or key > best_key:
+                    best_move, best_key = move, key
+        except (KeyError, chess.syzygy.MissingTableError):
+            return None
+
+        if best_move is None:
+            return None
+
+        result = AnalysisResult(board.turn)
+        result.best_move = best_move.uci()
+        result.pv = [result.best_move]
+        result.score_type = "cp"
+        if wdl == 2:
+            result.score_value = TB_WIN_SCORE - abs(dtz)
+            result.wdl = [1000, 0, 0]
+        elif wdl == -2:
+            result.score_value = -TB_WIN_SCORE + abs(dtz)
+            result.wdl = [0, 0, 1000]
+        else:
+            # Draws, and wins or losses spoiled by the 50 move rule (or about to be)
+            result.score_value = 0
+            result.wdl = [0, 1000, 0]
+        return result
+
+    def close(self):
+        self._tablebase.close()
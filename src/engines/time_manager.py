@@ -0,0 +1,47 @@
+import chess
+
+# Weights of the pieces for the game phase, the starting position adds up to MAX_PHASE
+PHASE_WEIGHTS = {chess.KNIGHT: 1, chess.BISHOP: 1, chess.ROOK: 2, chess.QUEEN: 4}
+MAX_PHASE = 24
+
+
+class TimeManager:
+    """Splits the time left on the clock into the time of a single search
+
+    The remaining time is spread over the moves the game is still expected
+    to last, more while the pieces are on the board and fewer in the
+    endgame, and most of the increment is spent on top. The time the bot
+    needs for each move besides the search (delays, mouse) is set aside
+    first. Below emergency_time every search gets emergency_movetime.
+    """
+
+    def __init__(self, move_overhead=0.5, emergency_time=10, emergency_movetime=0.1):
+        self.move_overhead = move_overhead
+        self.emergency_time = emergency_time
+        self.emergency_movetime = emergency_movetime
+
+    def phase(self, board):
+        """Returns 1 in the opening down to 0 with only kings and pawns left"""
+        phase = sum(
+            len(board.pieces(piece_type, color)) * weight
+            for piece_type, weight in PHASE_WEIGHTS.items()
+            for color in chess.COLORS
+        )
+        return min(phase, MAX_PHASE) / MAX_PHASE
+
+    def moves_left(self, board):
+        return 15 + 25 * self.phase(board)
+
+    def is_emergency(self, remaining):
+        return remaining < self.emergency_time
+
+    def movetime(self, board, remaining, increment=0):
+        """Returns the search time in milliseconds for the side with remaining (and increment) seconds"""
+        if self.is_emergency(remaining):
+            return int(self.emergency_movetime * 1000)
+
+        moves_left = self.moves_left(board)
+        budget = (remaining - self.move_overhead * moves_left) / moves_left + increment * 0.75
+        # Never bet a big part of the clock on a single move
+        budget = min(budget, remaining * 0.2)
+        return int(max(budget, self.emergency_movetime) * 1000)
@@ -0,0 +1,222 @@
+import queue
+import subprocess
+import threading
+
+from engines.analysis_result import AnalysisResult
+
+
+class EngineError(Exception):
+    """Raised when the engine process dies or stops answering"""
+
+
+def parse_info_line(line):
+    """Parse a UCI "info" line into a dict
+
+    Ex. "info depth 12 score cp 31 wdl 412 540 48 nodes 9000 nps 450000 pv e2e4 e7e5"
+    -> {"depth": 12, "score": {"type": "cp", "value": 31}, "wdl": [412, 540, 48],
+        "nodes": 9000, "nps": 450000, "pv": ["e2e4", "e7e5"]}
+    """
+    tokens = line.split()
+    info = {}
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        if token == "string":
+            # Free-form text, nothing after it is a field
+            break
+        elif token == "pv":
+            info["pv"] = tokens[i + 1:]
+            break
+        elif token == "score" and i + 2 < len(tokens):
+            info["score"] = {"type": tokens[i + 1], "value": int(tokens[i + 2])}
+            i += 3
+            if i < len(tokens) and tokens[i] in ("lowerbound", "upperbound"):
+                info["bound"] = tokens[i]
+                i += 1
+        elif token == "wdl" and i + 3 < len(tokens):
+            info["wdl"] = [int(tokens[i + 1]), int(tokens[i + 2]), int(tokens[i + 3])]
+            i += 4
+        elif token in ("depth", "seldepth", "multipv", "nodes", "nps", "time", "hashfull", "tbhits") \
+                and i + 1 < len(tokens):
+            try:
+                info[token] = int(tokens[i + 1])
+            except ValueError:
+                pass
+            i += 2
+        else:
+            i += 1
+    return info
+
+
+class UciEngine:
+    """A long-lived UCI engine process
+
+    Commands are written to the engine without waiting for a reply, so a
+    position and a go command travel together. A reader thread parses the
+    engine output as it streams in, and a single search yields the best move,
+    the score, the WDL stats and the principal variation.
+    """
+
+    def __init__(self, path, parameters=None):
+        # path is the executable, or a command line as a list, like [python, script]
+        # Raises PermissionError/OSError if the executable can't be started,
+        # EngineError if it doesn't answer like a UCI engine
+        command = [path] if isinstance(path, str) else list(path)
+        self._process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            bufsize=1,
+        )
+        self._events = queue.Queue()
+        self._write_lock = threading.Lock()
+        self._options = {}
+        self._searching = False
+        self._turn = True
+        self._search_turn = True
+
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+
+        try:
+            self._send("uci")
+            self._wait_for("uciok")
+
+            if parameters:
+                for name, value in parameters.items():
+                    self.set_option(name, value)
+            self.set_option("UCI_ShowWDL", "true")
+            self.wait_until_ready()
+        except EngineError:
+            self._process.kill()
+            raise
+
+    def _read_output(self):
+        """Parse the engine output line by line and queue the events"""
+        for line in self._process.stdout:
+            line = line.strip()
+            if line.startswith("info "):
+                self._events.put(("info", parse_info_line(line)))
+            elif line.startswith("bestmove"):
+                tokens = line.split()
+                best_move = tokens[1] if len(tokens) > 1 and tokens[1] != "(none)" else None
+                ponder_move = tokens[3] if len(tokens) > 3 and tokens[2] == "ponder" else None
+                self._events.put(("bestmove", (best_move, ponder_move)))
+            elif line.startswith("option name "):
+                # Remember the options the engine supports
+                name = line[len("option name "):].split(" type ")[0]
+                self._options[name.lower()] = name
+            elif line in ("uciok", "readyok"):
+                self._events.put((line, None))
+        self._events.put(("eof", None))
+
+    def _send(self, command):
+        with self._write_lock:
+            try:
+                self._process.stdin.write(command + "\n")
+                self._process.stdin.flush()
+            except (BrokenPipeError, OSError, ValueError):
+                raise EngineError("The engine process has terminated")
+
+    def _wait_for(self, event_name, timeout=10):
+        """Drop events until the given one arrives"""
+        while True:
+            try:
+                name, data = self._events.get(timeout=timeout)
+            except queue.Empty:
+                raise EngineError(f"Timed out waiting for {event_name}")
+            if name == event_name:
+                return data
+            if name == "eof":
+                raise EngineError("The engine process has terminated")
+
+    def has_option(self, name):
+        return name.lower() in self._options
+
+    def set_option(self, name, value):
+        """Set an option, silently skipping the ones the engine doesn't know"""
+        if not self.has_option(name):
+            return
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        self._send(f"setoption name {self._options[name.lower()]} value {value}")
+
+    def wait_until_ready(self):
+        self._send("isready")
+        self._wait_for("readyok")
+
+    def new_game(self):
+        self._send("ucinewgame")
+        self.wait_until_ready()
+
+    def set_position(self, fen=None, moves=None):
+        """Set the position from a FEN (or the start position) and a list of UCI moves"""
+        command = f"position fen {fen}" if fen else "position startpos"
+        if moves:
+            command += " moves " + " ".join(moves)
+        self._send(command)
+
+        # Keep track of the side to move so the scores can be interpreted
+        self._turn = (fen is None or fen.split()[1] == "w") == (len(moves or []) % 2 == 0)
+
+    def start_search(self, depth=None, movetime=None, nodes=None, ponder=False):
+        """Start a search without waiting for it to finish
+
+        A ponder search keeps going until ponderhit() or stop() is called.
+        """
+        command = "go ponder" if ponder else "go"
+        if depth is not None:
+            command += f" depth {depth}"
+        if movetime is not None:
+            command += f" movetime {movetime}"
+        if nodes is not None:
+            command += f" nodes {nodes}"
+        self._searching = True
+        self._search_turn = self._turn
+        self._send(command)
+
+    def wait_for_result(self, timeout=None):
+        """Collect the info lines of the running search until bestmove arrives"""
+        result = AnalysisResult(self._search_turn)
+        while True:
+            try:
+                name, data = self._events.get(timeout=timeout)
+            except queue.Empty:
+                raise EngineError("Timed out waiting for bestmove")
+
+            if name == "info":
+                # Only the main line matters
+                if data.get("multipv", 1) == 1:
+                    result.update(data)
+            elif name == "bestmove":
+                self._searching = False
+                result.best_move, result.ponder_move = data
+                return result
+            elif name == "eof":
+                self._searching = False
+                raise EngineError("The engine process has terminated")
+
+    def search(self, depth=None, movetime=None, nodes=None):
+        """Search the current position and return an AnalysisResult"""
+        self.start_search(depth=depth, movetime=movetime, nodes=nodes)
+        return self.wait_for_result()
+
+    def ponderhit(self):
+        """The expected move was played, turn the ponder search into a normal one"""
+        self._send("ponderhit")
+
+    def stop(self):
+        """Stop the running search and discard its result"""
+        if not self._searching:
+            return
+        self._send("stop")
+        self.wait_for_result()
+
+    def quit(self):
+        try:
+            self._send("quit")
+            self._process.wait(timeout=2)
+        except (EngineError, subprocess.TimeoutExpired):
+            self._process.kill()
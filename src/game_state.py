@@ -0,0 +1,80 @@
+import chess
+import chess.polyglot
+
+PIECE_VALUES = {
+    chess.PAWN: 1,
+    chess.KNIGHT: 3,
+    chess.BISHOP: 3,
+    chess.ROOK: 5,
+    chess.QUEEN: 9,
+}
+
+
+def material_balance(board):
+    """Calculate material balance, positive if white is ahead"""
+    white_material = 0
+    black_material = 0
+
+    for piece_type in PIECE_VALUES:
+        white_material += len(board.pieces(piece_type, chess.WHITE)) * PIECE_VALUES[piece_type]
+        black_material += len(board.pieces(piece_type, chess.BLACK)) * PIECE_VALUES[piece_type]
+
+    return white_material - black_material
+
+
+class GameState:
+    """Tracks the position of the current game
+
+    The position is keyed by its Zobrist hash. The engine is only sent the
+    position as of the last irreversible move (a capture or a pawn move)
+    plus the moves played since, so the cost of a move doesn't grow with the
+    length of the game while repetitions are still visible to the engine.
+    """
+
+    def __init__(self, move_list=None, fen=None):
+        self.board = chess.Board()
+        self.zobrist_key = 0
+        self._anchor_fen = None
+        self._moves_since_anchor = []
+        self.reset(move_list, fen)
+
+    def reset(self, move_list=None, fen=None):
+        """Start over from the initial position (or the FEN), optionally replaying a SAN move list"""
+        self.board = chess.Board(fen) if fen else chess.Board()
+        self._anchor_fen = fen
+        self._moves_since_anchor = []
+        for move in move_list or []:
+            self._push(self.board.parse_san(move))
+        self.zobrist_key = chess.polyglot.zobrist_hash(self.board)
+
+    def push_san(self, move_san):
+        """Play a SAN move, returns it in UCI notation"""
+        move = self.board.parse_san(move_san)
+        self._push(move)
+        self.zobrist_key = chess.polyglot.zobrist_hash(self.board)
+        return move.uci()
+
+    def push_uci(self, move_uci):
+        """Play a UCI move, returns it in SAN notation"""
+        move = chess.Move.from_uci(move_uci)
+        move_san = self.board.san(move)
+        self._push(move)
+        self.zobrist_key = chess.polyglot.zobrist_hash(self.board)
+        return move_san
+
+    def _push(self, move):
+        zeroing = self.board.is_zeroing(move)
+        self.board.push(move)
+        if zeroing:
+            # Nothing before this move can repeat, so it's a new starting point
+            self._anchor_fen = self.board.fen()
+            self._moves_since_anchor = []
+        else:
+            self._moves_since_anchor.append(move.uci())
+
+    def uci_position(self):
+        """Returns the (fen, moves) pair to send to the engine"""
+        return self._anchor_fen, list(self._moves_since_anchor)
+
+    def send_to(self, engine):
+        engine.set_position(*self.uci_position())
@@ -0,0 +1,29 @@
+class BoardGeometry:
+    """The screen rectangle of the board and the screen centers of its 64 squares
+
+    The centers are indexed like python-chess squares (a1 = 0, h8 = 63) and
+    take the board orientation into account, so a lookup is a list index.
+    """
+
+    def __init__(self, x, y, width, height, is_white):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.is_white = is_white
+
+        square_size = width / 8
+        self.square_centers = []
+        for square in range(64):
+            file_index, rank_index = square % 8, square // 8
+            if is_white:
+                column, row = file_index, 7 - rank_index
+            else:
+                column, row = 7 - file_index, rank_index
+            self.square_centers.append((
+                x + square_size * column + square_size / 2,
+                y + square_size * row + square_size / 2,
+            ))
+
+    def square_center(self, square):
+        return self.square_centers[square]
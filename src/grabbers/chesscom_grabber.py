@@ -1,12 +1,97 @@
 from selenium.common import NoSuchElementException
 from selenium.webdriver.common.by import By
 
-from grabbers.grabber import Grabber
+from grabbers.grabber import GEOMETRY_DIRTY_EXPRESSION, PARSE_CLOCK_FUNCTION, Grabber
+
+
+# Returns the moves that are not marked as processed yet (all of them if arguments[0] is true)
+# as [data-node, SAN] pairs and marks them as processed, or null if the move list isn't found
+# The result also tells whether the board geometry is out of date
+# Moves that are not pawn moves show the piece as a figurine instead of a letter
+GET_NEW_MOVES_SCRIPT = """
+var moveListElem = document.querySelector(".play-controller-scrollable")
+    || document.querySelector(".mode-swap-move-list-wrapper-component");
+if (moveListElem === null) {
+    return null;
+}
+
+var visibleMoves = moveListElem.querySelectorAll("div.node[data-node]");
+var moveElems = arguments[0]
+    ? visibleMoves
+    : moveListElem.querySelectorAll("div.node[data-node]:not([data-processed])");
+
+var moves = [];
+for (var i = 0; i < moveElems.length; i++) {
+    var moveElem = moveElems[i];
+    var moveClass = moveElem.getAttribute("class") || "";
+
+    // Check if it is indeed a move
+    if (moveClass.indexOf("white-move") === -1 && moveClass.indexOf("black-move") === -1) {
+        continue;
+    }
+
+    var figurineElem = moveElem.querySelector("[data-figurine]");
+    var figure = figurineElem === null ? null : figurineElem.getAttribute("data-figurine");
+    var text = moveElem.innerText.trim();
+
+    var move;
+    if (figure === null) {
+        move = text;
+    } else if (text.indexOf("=") !== -1) {
+        // Promotion, the check sign goes after the promoted piece
+        move = text + figure;
+        if (move.indexOf("+") !== -1) {
+            move = move.replace(/\+/g, "") + "+";
+        }
+    } else {
+        move = figure + text;
+    }
+
+    moves.push([moveElem.getAttribute("data-node"), move]);
+    moveElem.setAttribute("data-processed", "true");
+}
+
+return {count: visibleMoves.length, moves: moves, geometryDirty: """ + GEOMETRY_DIRTY_EXPRESSION + """};
+"""
+
+
+# Returns both clocks as {white, black, running, increment} in seconds, or null without clocks
+# The clock elements are kept on the window and only looked up again once they leave the page
+# The increment isn't shown next to the clocks, so it is taken as 0
+GET_CLOCKS_SCRIPT = PARSE_CLOCK_FUNCTION + """
+var clocks = window.__pawnbitClocks;
+if (!clocks || !document.contains(clocks.white) || !document.contains(clocks.black)) {
+    clocks = window.__pawnbitClocks = {
+        white: document.querySelector(".clock-component.clock-white"),
+        black: document.querySelector(".clock-component.clock-black")
+    };
+}
+if (clocks.white === null || clocks.black === null) {
+    window.__pawnbitClocks = null;
+    return null;
+}
+
+var white = parseClock(clocks.white.querySelector(".clock-time-monospace") || clocks.white);
+var black = parseClock(clocks.black.querySelector(".clock-time-monospace") || clocks.black);
+if (white === null || black === null) {
+    return null;
+}
+
+var running = null;
+if (clocks.white.classList.contains("clock-player-turn")) {
+    running = "white";
+} else if (clocks.black.classList.contains("clock-player-turn")) {
+    running = "black";
+}
+return {white: white, black: black, running: running, increment: 0};
+"""
 
 
 class ChesscomGrabber(Grabber):
-    def __init__(self, chrome_url, chrome_session_id):
-        super().__init__(chrome_url, chrome_session_id)
+    move_list_selector = ".play-controller-scrollable, .mode-swap-move-list-wrapper-component, .board-modal-container"
+
+    def __init__(self, chrome_url, chrome_session_id, chrome=None):
+        super().__init__(chrome_url, chrome_session_id, chrome)
         # The moves_list is now initialized in the base class
 
     def update_board_elem(self):
@@ -64,67 +149,24 @@ class ChesscomGrabber(Grabber):
         self.moves_list = {}
 
     def get_move_list(self):
-        # Find the moves list
-        try:
-            move_list_elem = self.chrome.find_element(By.CLASS_NAME, "play-controller-scrollable")
-        except NoSuchElementException:
-            try:
-                move_list_elem = self.chrome.find_element(By.CLASS_NAME, "mode-swap-move-list-wrapper-component")
-            except NoSuchElementException:
-                    return None
+        # Read the new moves, already converted to SAN, in a single round-trip
+        result = self.chrome.execute_script(GET_NEW_MOVES_SCRIPT, not self.moves_list)
+        if result is None:
+            return None
+        self.update_geometry_state(result["geometryDirty"])
 
-        # Check if we're in a new game by looking at the number of moves
         # If there are no visible moves but we have moves in our list, we're in a new game
-        visible_moves = move_list_elem.find_elements(By.CSS_SELECTOR, "div.node[data-node]")
-        if len(visible_moves) == 0 and self.moves_list:
-            # Reset moves list for new game
+        if result["count"] == 0 and self.moves_list:
             self.reset_moves_list()
 
-        # Select all children with class containing "white node" or "black node"
-        # Moves that are not pawn moves have a different structure
-        # containing children
-        if not self.moves_list:
-            # If the moves list is empty, find all moves
-            moves = move_list_elem.find_elements(By.CSS_SELECTOR, "div.node[data-node]")
-        else:
-            # If the moves list is not empty, find only the new moves
-            moves = move_list_elem.find_elements(By.CSS_SELECTOR, "div.node[data-node]:not([data-processed])")
-
-        for move in moves:
-            move_class = move.get_attribute("class")
-
-            # Check if it is indeed a move
-            if "white-move" in move_class or "black-move" in move_class:
-                # Check if it has a figure - search deeper in the structure
-                try:
-                    # Look for any element with data-figurine attribute anywhere within this move
-                    figurine_elem = move.find_element(By.CSS_SELECTOR, "[data-figurine]")
-                    figure = figurine_elem.get_attribute("data-figurine")
-                except NoSuchElementException:
-                    figure = None
-
-                # Check if it was en-passant or figure-move
-                if figure is None:
-                    # If the moves_list is empty or the last move was not the current move
-                    self.moves_list[move.get_attribute("data-node")] = move.text
-                elif "=" in move.text:
-                    m = move.text + figure
-                    # If the move is a check, add the + in the end
-                    if "+" in m:
-                        m = m.replace("+", "")
-                        m += "+"
-
-                    # If the moves_list is empty or the last move was not the current move
-                    self.moves_list[move.get_attribute("data-node")] = m
-                else:
-                    # If the moves_list is empty or the last move was not the current move
-                    self.moves_list[move.get_attribute("data-node")] = figure + move.text
-
-                # Mark the move as processed
-                self.chrome.execute_script("arguments[0].setAttribute('data-processed', 'true')", move)
+        for node, move in result["moves"]:
+            self.moves_list[node] = move
 
         return list(self.moves_list.values())
 
+    def get_clocks(self):
+        return self.read_clocks(GET_CLOCKS_SCRIPT)
+
     def is_game_puzzles(self):
         return False
 
@@ -0,0 +1,87 @@
+import threading
+import time
+
+
+class CommandStats:
+    """Counts the WebDriver commands of a session and the time they take, by command
+
+    Every command is an HTTP round-trip to the driver, so these numbers show
+    what the grabber's batching and caching actually save. The counters since
+    the last report and the ones of the whole game are kept apart. If a tracer
+    is set, every command is also recorded as a span of the trace.
+    """
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self._lock = threading.Lock()
+        # Command name -> [count, total nanoseconds, longest nanoseconds]
+        self._commands = {}
+        self._report_count = 0
+        self._report_time = 0
+
+    def record(self, command, start, end):
+        """Record a command from its perf_counter_ns timestamps"""
+        duration = end - start
+        with self._lock:
+            entry = self._commands.get(command)
+            if entry is None:
+                entry = self._commands[command] = [0, 0, 0]
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+            self._report_count += 1
+            self._report_time += duration
+        if self.tracer is not None:
+            self.tracer.record(f"webdriver {command}", start, end)
+
+    def take_report(self):
+        """Returns the (count, seconds) of the commands since the last report"""
+        with self._lock:
+            count, duration = self._report_count, self._report_time
+            self._report_count = 0
+            self._report_time = 0
+        return count, duration / 1e9
+
+    def totals(self):
+        """Returns the (count, seconds) of the commands of the game"""
+        with self._lock:
+            return (
+                sum(entry[0] for entry in self._commands.values()),
+                sum(entry[1] for entry in self._commands.values()) / 1e9,
+            )
+
+    def summary(self):
+        """Returns {command: {count, total_ms, mean_ms, max_ms}} of the game"""
+        with self._lock:
+            return {
+                command: {
+                    "count": count,
+                    "total_ms": total / 1e6,
+                    "mean_ms": total / count / 1e6,
+                    "max_ms": longest / 1e6,
+                }
+                for command, (count, total, longest) in self._commands.items()
+            }
+
+    def reset(self):
+        """Start counting a new game"""
+        with self._lock:
+            self._commands = {}
+            self._report_count = 0
+            self._report_time = 0
+
+
+def instrument(driver, command_stats):
+    """Make every command the driver (or one of its elements) sends count in command_stats"""
+    execute = driver.execute
+
+    def timed_execute(driver_command, params=None):
+        start = time.perf_counter_ns()
+        try:
+            return execute(driver_command, params)
+        finally:
+            command_stats.record(driver_command, start, time.perf_counter_ns())
+
+    # Elements send their commands through their driver's execute as well
+    driver.execute = timed_execute
+    return driver
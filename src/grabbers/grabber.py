@@ -1,15 +1,163 @@
+import time
 from abc import ABC, abstractmethod
 
+from grabbers.board_geometry import BoardGeometry
+from grabbers.command_stats import CommandStats, instrument
 from utilities import attach_to_session
 
 
+# How long (in seconds) a clock reading is extrapolated before the clocks are read again
+CLOCK_REFRESH_TIME = 2
+
+# Declares parseClock(elem), which turns a clock text like "1:02:03" or "00:09.7"
+# into seconds, null if there is no clock. Used by the clock scripts of the grabbers
+PARSE_CLOCK_FUNCTION = """
+var parseClock = function (elem) {
+    if (elem === null) {
+        return null;
+    }
+    var parts = elem.innerText.replace(/[^0-9:.]/g, "").split(":");
+    var seconds = 0;
+    for (var i = 0; i < parts.length; i++) {
+        seconds = seconds * 60 + parseFloat(parts[i] || "0");
+    }
+    return isNaN(seconds) ? null : seconds;
+};
+"""
+
+# Evaluates to true if the board geometry measured by MEASURE_BOARD_SCRIPT is out of date,
+# because the page was resized or scrolled, the window was moved or nothing was measured yet
+# It is appended to the scripts the bot runs anyway, so checking it costs no round-trip
+GEOMETRY_DIRTY_EXPRESSION = """(function () {
+    var geometry = window.__pawnbitGeometry;
+    return !geometry || geometry.dirty || geometry.screenX !== window.screenX || geometry.screenY !== window.screenY;
+})()"""
+
+# Returns the screen rectangle of the board element arguments[0] and installs
+# (once per page) the listeners that mark the measurement as out of date
+MEASURE_BOARD_SCRIPT = """
+var geometry = window.__pawnbitGeometry;
+if (!geometry) {
+    geometry = window.__pawnbitGeometry = {};
+    var markDirty = function () {
+        geometry.dirty = true;
+    };
+    window.addEventListener("resize", markDirty);
+    window.addEventListener("scroll", markDirty, true);
+}
+geometry.dirty = false;
+geometry.screenX = window.screenX;
+geometry.screenY = window.screenY;
+
+var rect = arguments[0].getBoundingClientRect();
+return {
+    x: window.screenX + (window.outerWidth - window.innerWidth) / 2 + rect.left,
+    y: window.screenY + (window.outerHeight - window.innerHeight) + rect.top,
+    width: rect.width,
+    height: rect.height
+};
+"""
+
+# Like MEASURE_BOARD_SCRIPT, but returns null without measuring if the last measurement is still valid
+MEASURE_BOARD_IF_DIRTY_SCRIPT = "if (!" + GEOMETRY_DIRTY_EXPRESSION + ") {\n    return null;\n}\n" + MEASURE_BOARD_SCRIPT
+
+# Installs (once per page) a MutationObserver that queues the nodes added to or
+# removed from the elements matching arguments[0], then waits until the queue is
+# not empty or arguments[1] milliseconds have passed, and drains it
+# Returns {changes, geometryDirty}
+WAIT_FOR_MOVE_LIST_CHANGE_SCRIPT = """
+var selector = arguments[0];
+var timeout = arguments[1];
+var done = arguments[arguments.length - 1];
+
+var state = window.__pawnbitMoveQueue;
+if (!state || state.selector !== selector) {
+    if (state) {
+        state.observer.disconnect();
+    }
+    state = window.__pawnbitMoveQueue = {selector: selector, queue: [], waiter: null};
+
+    var isWatched = function (node) {
+        var elem = node.nodeType === Node.ELEMENT_NODE ? node : node.parentElement;
+        if (!elem) {
+            return false;
+        }
+        return elem.closest(selector) !== null
+            || (node.nodeType === Node.ELEMENT_NODE && node.querySelector(selector) !== null);
+    };
+
+    state.observer = new MutationObserver(function (records) {
+        for (var i = 0; i < records.length; i++) {
+            var record = records[i];
+            if (record.type === "characterData") {
+                if (isWatched(record.target)) {
+                    state.queue.push(record.target.textContent);
+                }
+                continue;
+            }
+            var nodes = Array.prototype.slice.call(record.addedNodes)
+                .concat(Array.prototype.slice.call(record.removedNodes));
+            for (var j = 0; j < nodes.length; j++) {
+                if (isWatched(record.target) || isWatched(nodes[j])) {
+                    state.queue.push(nodes[j].textContent);
+                }
+            }
+        }
+        if (state.queue.length > 0 && state.waiter !== null) {
+            state.waiter();
+        }
+    });
+    state.observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+}
+
+var drain = function () {
+    var queue = state.queue;
+    state.queue = [];
+    state.waiter = null;
+    return {changes: queue, geometryDirty: """ + GEOMETRY_DIRTY_EXPRESSION + """};
+};
+
+if (state.queue.length > 0) {
+    done(drain());
+    return;
+}
+
+var timer = setTimeout(function () {
+    done(drain());
+}, timeout);
+state.waiter = function () {
+    clearTimeout(timer);
+    done(drain());
+};
+"""
+
+
 # Base abstract class for different chess sites
 class Grabber(ABC):
-    def __init__(self, chrome_url, chrome_session_id):
-        self.chrome = attach_to_session(chrome_url, chrome_session_id)
+    # CSS selector of the elements whose changes mean a move was made
+    # or the game ended, watched by wait_for_move_list_change
+    move_list_selector = None
+
+    # chrome is a driver to use instead of attaching to the session, like the fake one of the benchmarks
+    def __init__(self, chrome_url, chrome_session_id, chrome=None):
+        if chrome is None:
+            chrome = attach_to_session(chrome_url, chrome_session_id)
+
+        # Every WebDriver command of the session is counted and timed
+        self.command_stats = CommandStats()
+        self.chrome = instrument(chrome, self.command_stats)
         self._board_elem = None
         self.moves_list = {}
 
+        # The board geometry and the board element it was measured for
+        self._board_geometry = None
+        self._board_geometry_elem = None
+
+        # The last clock reading, when it was made and how many moves were known then
+        self._clock_reading = None
+        self._clock_read_time = None
+        self._clock_read_moves = None
+
     def get_board(self):
         return self._board_elem
 
@@ -18,11 +166,74 @@ class Grabber(ABC):
         """Reset the moves list when a new game starts"""
         self.moves_list = {}
 
-    # Returns the coordinates of the top left corner of the ChromeDriver
-    def get_top_left_corner(self):
-        canvas_x_offset = self.chrome.execute_script("return window.screenX + (window.outerWidth - window.innerWidth) / 2 - window.scrollX;")
-        canvas_y_offset = self.chrome.execute_script("return window.screenY + (window.outerHeight - window.innerHeight) - window.scrollY;")
-        return canvas_x_offset, canvas_y_offset
+    # Returns the BoardGeometry of the board element from the player's point of view
+    # The board is only measured again after the page reported a change
+    def get_board_geometry(self, is_white):
+        geometry = self._board_geometry
+        if geometry is None or geometry.is_white != is_white or self._board_geometry_elem is not self._board_elem:
+            rect = self.chrome.execute_script(MEASURE_BOARD_SCRIPT, self._board_elem)
+            geometry = BoardGeometry(rect["x"], rect["y"], rect["width"], rect["height"], is_white)
+            self._board_geometry = geometry
+            self._board_geometry_elem = self._board_elem
+        return geometry
+
+    # Makes sure the cached board geometry is current right before it is used for a drag
+    # In one round-trip the page checks whether it changed since and only then measures again
+    def refresh_board_geometry(self, is_white):
+        geometry = self._board_geometry
+        if geometry is None or geometry.is_white != is_white or self._board_geometry_elem is not self._board_elem:
+            return self.get_board_geometry(is_white)
+        rect = self.chrome.execute_script(MEASURE_BOARD_IF_DIRTY_SCRIPT, self._board_elem)
+        if rect is not None:
+            self._board_geometry = BoardGeometry(rect["x"], rect["y"], rect["width"], rect["height"], is_white)
+        return self._board_geometry
+
+    # Drops the cached board geometry if a script reported it as out of date
+    def update_geometry_state(self, geometry_dirty):
+        if geometry_dirty:
+            self._board_geometry = None
+
+    # Blocks inside the page until the move list changes or the timeout (in seconds) runs out
+    # Returns the texts of the changed move nodes, an empty list on timeout
+    def wait_for_move_list_change(self, timeout=0.5):
+        if self.move_list_selector is None:
+            time.sleep(timeout)
+            return []
+        result = self.chrome.execute_async_script(
+            WAIT_FOR_MOVE_LIST_CHANGE_SCRIPT, self.move_list_selector, int(timeout * 1000)
+        )
+        self.update_geometry_state(result["geometryDirty"])
+        return result["changes"]
+
+    # Runs a clock script returning {white, black, running, increment} (or null) and returns
+    # the clocks as (white seconds, black seconds, increment seconds), None if there are none
+    # The reading is only repeated after a move or CLOCK_REFRESH_TIME, in between
+    # the time passed since is taken off the running clock
+    def read_clocks(self, script):
+        now = time.monotonic()
+        if (self._clock_read_time is None or now - self._clock_read_time > CLOCK_REFRESH_TIME
+                or self._clock_read_moves != len(self.moves_list)):
+            self._clock_reading = self.chrome.execute_script(script)
+            self._clock_read_time = now
+            self._clock_read_moves = len(self.moves_list)
+
+        reading = self._clock_reading
+        if reading is None:
+            return None
+
+        elapsed = now - self._clock_read_time
+        white_time, black_time = reading["white"], reading["black"]
+        if reading["running"] == "white":
+            white_time = max(0, white_time - elapsed)
+        elif reading["running"] == "black":
+            black_time = max(0, black_time - elapsed)
+        return white_time, black_time, reading["increment"]
+
+    # Returns the clocks as (white seconds, black seconds, increment seconds),
+    # None if they can't be read
+    @abstractmethod
+    def get_clocks(self):
+        pass
 
     # Sets the _board_elem variable
     @abstractmethod
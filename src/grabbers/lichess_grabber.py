@@ -1,16 +1,151 @@
-import re
+import time
 
 from selenium.common import NoSuchElementException, StaleElementReferenceException
 from selenium.webdriver.common.by import By
 
-from grabbers.grabber import Grabber
+from grabbers.grabber import GEOMETRY_DIRTY_EXPRESSION, PARSE_CLOCK_FUNCTION, Grabber
+
+
+# How long (in seconds) the moves read by is_game_over can be handed out by get_move_list
+POLL_REUSE_TIME = 0.05
+
+# Reads everything the bot polls for in one go and returns
+# {page, puzzles, gameOver, tagName, moves, noMoves, geometryDirty}
+# The page mode and the move tag name are cached on the window, so they
+# are detected again only after a navigation. moves holds the sanitized
+# moves not marked as processed yet (all of them if arguments[0] is true)
+# as [key, SAN] pairs, or null if the move list isn't found
+POLL_SCRIPT = """
+var xpath = function (path) {
+    return document.evaluate(path, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+};
+
+var page = window.__pawnbitPage;
+if (!page) {
+    page = window.__pawnbitPage = {id: Math.random().toString(36).slice(2), puzzles: null, tagName: null, count: 0};
+}
+
+if (page.puzzles === null) {
+    if (xpath("/html/body/div[2]/main/aside/div[1]/div[1]/div/p[1]") !== null) {
+        page.puzzles = true;
+    } else if (xpath('//*[@id="main-wrap"]/main/div[1]/rm6') !== null) {
+        page.puzzles = false;
+    }
+}
+
+var gameOver = xpath('//*[@id="main-wrap"]/main/aside/div/section[2]') !== null;
+if (!gameOver) {
+    var puzzleGameOverWindow = xpath("/html/body/div[2]/main/div[2]/div[3]/div[1]");
+    gameOver = puzzleGameOverWindow !== null && puzzleGameOverWindow.getAttribute("class") === "complete";
+}
+
+var result = {
+    page: page.id,
+    puzzles: page.puzzles === true,
+    gameOver: gameOver,
+    tagName: page.tagName,
+    moves: null,
+    noMoves: false,
+    geometryDirty: """ + GEOMETRY_DIRTY_EXPRESSION + """
+};
+
+var moveListElem;
+var moveSelector;
+if (page.puzzles === true) {
+    moveListElem = xpath("/html/body/div[2]/main/div[2]/div[2]/div");
+    if (moveListElem === null) {
+        return result;
+    }
+    moveSelector = "move";
+} else {
+    moveListElem = xpath('//*[@id="main-wrap"]/main/div[1]/rm6/l4x');
+    if (moveListElem === null) {
+        // The move list container without the list means no moves yet
+        if (xpath('//*[@id="main-wrap"]/main/div[1]/rm6') !== null) {
+            result.moves = [];
+            result.noMoves = true;
+        }
+        return result;
+    }
+    if (page.tagName === null) {
+        if (moveListElem.lastElementChild === null) {
+            result.moves = [];
+            result.noMoves = true;
+            return result;
+        }
+        page.tagName = moveListElem.lastElementChild.tagName.toLowerCase();
+        result.tagName = page.tagName;
+    }
+    moveSelector = page.tagName;
+}
+
+var moveElems = moveListElem.querySelectorAll(arguments[0] ? moveSelector : moveSelector + ":not([data-processed])");
+result.moves = [];
+for (var i = 0; i < moveElems.length; i++) {
+    var moveElem = moveElems[i];
+    var key = moveElem.getAttribute("data-processed");
+    if (key === null) {
+        key = page.id + ":" + (page.count++);
+        moveElem.setAttribute("data-processed", key);
+    }
+    var move = moveElem.innerText.replace(/[^a-zA-Z0-9+-]/g, "");
+    if (move !== "") {
+        result.moves.push([key, move]);
+    }
+}
+return result;
+"""
+
+
+# Returns both clocks as {white, black, running, increment} in seconds, or null without clocks
+# The clock elements are kept on the window and only looked up again once they leave the page
+# The increment comes from the time control (like "3+2") in the game info
+GET_CLOCKS_SCRIPT = PARSE_CLOCK_FUNCTION + """
+var clocks = window.__pawnbitClocks;
+if (!clocks || !document.contains(clocks.white) || !document.contains(clocks.black)) {
+    var setup = document.querySelector(".game__meta .setup");
+    var increment = setup === null ? null : setup.innerText.match(/\\+(\\d+)/);
+    clocks = window.__pawnbitClocks = {
+        white: document.querySelector(".rclock.rclock-white"),
+        black: document.querySelector(".rclock.rclock-black"),
+        increment: increment === null ? 0 : parseInt(increment[1], 10)
+    };
+}
+if (clocks.white === null || clocks.black === null) {
+    window.__pawnbitClocks = null;
+    return null;
+}
+
+var white = parseClock(clocks.white.querySelector(".time"));
+var black = parseClock(clocks.black.querySelector(".time"));
+if (white === null || black === null) {
+    return null;
+}
+
+var running = null;
+if (clocks.white.classList.contains("running")) {
+    running = "white";
+} else if (clocks.black.classList.contains("running")) {
+    running = "black";
+}
+return {white: white, black: black, running: running, increment: clocks.increment};
+"""
 
 
 class LichessGrabber(Grabber):
-    def __init__(self, chrome_url, chrome_session_id):
-        super().__init__(chrome_url, chrome_session_id)
+    move_list_selector = "rm6, .puzzle__moves"
+
+    def __init__(self, chrome_url, chrome_session_id, chrome=None):
+        super().__init__(chrome_url, chrome_session_id, chrome)
         self.tag_name = None
 
+        # State read by the last poll
+        self._page_id = None
+        self._is_puzzles = None
+        self._is_game_over = False
+        self._polled_moves = None
+        self._unread_poll_time = None
+
     def update_board_elem(self):
         # Keep looking for board
         while True:
@@ -38,128 +173,48 @@ class LichessGrabber(Grabber):
             return False
 
     def is_game_over(self):
-        # sourcery skip: assign-if-exp, boolean-if-exp-identity, reintroduce-else, remove-unnecessary-cast
-        try:
-            # Find the game over window
-            self.chrome.find_element(By.XPATH, '//*[@id="main-wrap"]/main/aside/div/section[2]')
-
-            # If we don't have an exception at this point, we have found the game over window
-            return True
-        except NoSuchElementException:
-            # Try finding the puzzles game over window and checking its class
-            try:
-                # The game over window
-                game_over_window = self.chrome.find_element(By.XPATH, '/html/body/div[2]/main/div[2]/div[3]/div[1]')
-
-                if game_over_window.get_attribute("class") == "complete":
-                    return True
-
-                # If we don't have an exception at this point and the window's class is not "complete",
-                # then the game is still going
-                return False
-            except NoSuchElementException:
-                return False
-
-    def set_moves_tag_name(self):
-        if self.is_game_puzzles():
-            return False
-
-        move_list_elem = self.get_normal_move_list_elem()
-
-        if move_list_elem is None or move_list_elem == []:
-            return False
-
-        try:
-            last_child = move_list_elem.find_element(By.XPATH, "*[last()]")
-            self.tag_name = last_child.tag_name
-
-            return True
-        except NoSuchElementException:
-            return False
-
-    def get_move_list(self):
-        # sourcery skip: assign-if-exp, merge-else-if-into-elif, use-fstring-for-concatenation
-        is_puzzles = self.is_game_puzzles()
-
-        # Find the move list element
-        if is_puzzles:
-            move_list_elem = self.get_puzzles_move_list_elem()
-
-            if move_list_elem is None:
-                return None
+        self.poll()
+        return self._is_game_over
+
+    def poll(self):
+        # Read the page mode, the game over state and the new moves in a single round-trip
+        result = self.chrome.execute_script(POLL_SCRIPT, not self.moves_list)
+
+        # A new page means a new game, the processed markers are gone with the old one
+        if result["page"] != self._page_id:
+            self._page_id = result["page"]
+            self.reset_moves_list()
+
+        self.update_geometry_state(result["geometryDirty"])
+        self.tag_name = result["tagName"]
+        self._is_puzzles = result["puzzles"]
+        self._is_game_over = result["gameOver"]
+
+        if result["moves"] is None:
+            self._polled_moves = None
+        elif result["noMoves"]:
+            self._polled_moves = []
         else:
-            move_list_elem = self.get_normal_move_list_elem()
-
-            if move_list_elem is None:
-                return None
-            if (not move_list_elem) or (self.tag_name is None and self.set_moves_tag_name() is False):
-                return []
-
-        # Get the move elements (children of the move list element)
-        try:
-            if not is_puzzles:
-                if not self.moves_list:
-                    # If the moves list is empty, find all moves
-                    children = move_list_elem.find_elements(By.CSS_SELECTOR, self.tag_name)
-                else:
-                    # If the moves list is not empty, find only the new moves
-                    children = move_list_elem.find_elements(By.CSS_SELECTOR, self.tag_name + ":not([data-processed])")
-            else:
-                if not self.moves_list:
-                    # If the moves list is empty, find all moves
-                    children = move_list_elem.find_elements(By.CSS_SELECTOR, "move")
-                else:
-                    # If the moves list is not empty, find only the new moves
-                    children = move_list_elem.find_elements(By.CSS_SELECTOR, "move:not([data-processed])")
-        except NoSuchElementException:
-            return None
-
-        # Get the moves from the elements
-        for move_element in children:
-            # Sanitize the move
-            move = re.sub(r"[^a-zA-Z0-9+-]", "", move_element.text)
-            if move != "":
-                self.moves_list[move_element.id] = move
-
-            # Mark the move as processed
-            self.chrome.execute_script("arguments[0].setAttribute('data-processed', 'true')", move_element)
-
-        return [val for val in self.moves_list.values()]
-
-    def get_puzzles_move_list_elem(self):
-        try:
-            # Try finding the move list in the puzzles page
-            move_list_elem = self.chrome.find_element(By.XPATH, '/html/body/div[2]/main/div[2]/div[2]/div')
-
-            return move_list_elem
-        except NoSuchElementException:
-            return None
+            for key, move in result["moves"]:
+                self.moves_list[key] = move
+            self._polled_moves = list(self.moves_list.values())
+        self._unread_poll_time = time.monotonic()
 
-    def get_normal_move_list_elem(self):
-        try:
-            # Try finding the normal move list
-            move_list_elem = self.chrome.find_element(By.XPATH, '//*[@id="main-wrap"]/main/div[1]/rm6/l4x')
-
-            return move_list_elem
-        except NoSuchElementException:
-            try:
-                # Try finding the normal move list when there are no moves yet
-                self.chrome.find_element(By.XPATH, '//*[@id="main-wrap"]/main/div[1]/rm6')
+    def get_move_list(self):
+        # Reuse the moves just read by is_game_over if nobody has read them yet
+        if self._unread_poll_time is None or time.monotonic() - self._unread_poll_time > POLL_REUSE_TIME:
+            self.poll()
+        self._unread_poll_time = None
+        return self._polled_moves
 
-                # If we don't have an exception at this point, we don't have any moves yet
-                return []
-            except NoSuchElementException:
-                return None
+    def get_clocks(self):
+        return self.read_clocks(GET_CLOCKS_SCRIPT)
 
     def is_game_puzzles(self):
-        try:
-            # Try finding the puzzles text
-            self.chrome.find_element(By.XPATH, "/html/body/div[2]/main/aside/div[1]/div[1]/div/p[1]")
-
-            # If we don't have an exception at this point, the game is a puzzle
-            return True
-        except NoSuchElementException:
-            return False
+        # The page mode is cached until the next navigation
+        if self._is_puzzles is None:
+            self.poll()
+        return self._is_puzzles
 
     def click_puzzle_next(self):
         # Find the next continue training button
@@ -11,10 +11,19 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service as ChromeService
 from overlay import run
+from overlay_channel import OverlayChannel
+from accuracy import format_accuracy
+import protocol
 from stockfish_bot import StockfishBot
+from engines.engine_pool import start_engine_pool_server
+from engines import position_store
 from selenium.common import WebDriverException
 import keyboard
 
+# Engine results kept across sessions, compacted when the GUI closes
+POSITION_STORE_PATH = "positions.bin"
+TRACE_DIRECTORY = "traces"
+
 
 class ModernGUI:
     def __init__(self, master):
@@ -42,11 +51,19 @@ class ModernGUI:
 
         # Used for the communication between the GUI and the Stockfish Bot process
         self.stockfish_bot_pipe = None
+        self.stockfish_bot_pipe_ready = threading.Event()
         self.overlay_screen_pipe = None
 
+        # The engine pool shared by the bot processes for background analysis
+        self.engine_pool_manager = None
+        self.engine_pool = None
+        self.engine_pool_key = None
+        self.analysis_cache = None
+
         # The Stockfish Bot process
         self.stockfish_bot_process = None
         self.overlay_screen_process = None
+        self.overlay_channel = None
         self.restart_after_stopping = False
 
         # Used for storing the match moves
@@ -181,7 +198,9 @@ class ModernGUI:
             ("Win/Draw/Loss:", "wdl_text"),
             ("Material:", "material_text"),
             ("Bot Accuracy:", "bot_acc_text"),
-            ("Opponent Accuracy:", "opp_acc_text")
+            ("Opponent Accuracy:", "opp_acc_text"),
+            ("Ponder Hit Rate:", "ponder_text"),
+            ("WebDriver Calls:", "webdriver_text")
         ]
         
         for label_text, attr_name in eval_metrics:
@@ -458,6 +477,34 @@ class ModernGUI:
         )
         delay_cb.pack(anchor=tk.W, pady=2)
         
+        # Time management
+        self.enable_time_management = tk.BooleanVar(value=False)
+        time_management_cb = tk.Checkbutton(
+            options_frame,
+            text="Clock Time Management",
+            variable=self.enable_time_management,
+            font=("Segoe UI", 9),
+            bg=self.bg_secondary,
+            fg=self.text_primary,
+            selectcolor=self.bg_tertiary,
+            activebackground=self.bg_secondary
+        )
+        time_management_cb.pack(anchor=tk.W, pady=2)
+        
+        # Latency tracing
+        self.enable_tracing = tk.BooleanVar(value=False)
+        tracing_cb = tk.Checkbutton(
+            options_frame,
+            text="Latency Tracing",
+            variable=self.enable_tracing,
+            font=("Segoe UI", 9),
+            bg=self.bg_secondary,
+            fg=self.text_primary,
+            selectcolor=self.bg_tertiary,
+            activebackground=self.bg_secondary
+        )
+        tracing_cb.pack(anchor=tk.W, pady=2)
+        
         # Mouse latency
         latency_frame = tk.Frame(options_frame, bg=self.bg_secondary)
         latency_frame.pack(fill=tk.X, pady=5)
@@ -535,6 +582,88 @@ class ModernGUI:
         )
         self.stockfish_path_text.pack(fill=tk.X)
         
+        # Opening book
+        tk.Label(
+            sf_frame,
+            text="Opening Book (optional)",
+            font=("Segoe UI", 9, "bold"),
+            bg=self.bg_secondary,
+            fg=self.text_secondary
+        ).pack(anchor=tk.W, pady=(0, 5))
+        
+        self.opening_book_path = None
+        
+        book_button = tk.Button(
+            sf_frame,
+            text="📖 SELECT OPENING BOOK",
+            command=self.on_select_opening_book_button_listener,
+            font=("Segoe UI", 9, "bold"),
+            bg=self.accent_color,
+            fg="#1e1e2e",
+            activebackground=self.accent_hover,
+            relief=tk.FLAT,
+            cursor="hand2",
+            pady=8
+        )
+        book_button.pack(fill=tk.X, pady=2)
+        
+        book_display_frame = tk.Frame(sf_frame, bg=self.bg_tertiary, relief=tk.FLAT)
+        book_display_frame.pack(fill=tk.X, pady=(2, 10))
+        
+        self.opening_book_path_text = tk.Label(
+            book_display_frame,
+            text="No book, every move is searched",
+            font=("Segoe UI", 8),
+            bg=self.bg_tertiary,
+            fg=self.text_secondary,
+            wraplength=320,
+            justify=tk.LEFT,
+            padx=8,
+            pady=8
+        )
+        self.opening_book_path_text.pack(fill=tk.X)
+        
+        # Endgame tablebases
+        tk.Label(
+            sf_frame,
+            text="Syzygy Tablebases (optional)",
+            font=("Segoe UI", 9, "bold"),
+            bg=self.bg_secondary,
+            fg=self.text_secondary
+        ).pack(anchor=tk.W, pady=(0, 5))
+        
+        self.tablebase_path = None
+        
+        tablebase_button = tk.Button(
+            sf_frame,
+            text="📁 SELECT TABLEBASE FOLDER",
+            command=self.on_select_tablebase_button_listener,
+            font=("Segoe UI", 9, "bold"),
+            bg=self.accent_color,
+            fg="#1e1e2e",
+            activebackground=self.accent_hover,
+            relief=tk.FLAT,
+            cursor="hand2",
+            pady=8
+        )
+        tablebase_button.pack(fill=tk.X, pady=2)
+        
+        tablebase_display_frame = tk.Frame(sf_frame, bg=self.bg_tertiary, relief=tk.FLAT)
+        tablebase_display_frame.pack(fill=tk.X, pady=(2, 10))
+        
+        self.tablebase_path_text = tk.Label(
+            tablebase_display_frame,
+            text="No tablebases, endgames are searched",
+            font=("Segoe UI", 8),
+            bg=self.bg_tertiary,
+            fg=self.text_secondary,
+            wraplength=320,
+            justify=tk.LEFT,
+            padx=8,
+            pady=8
+        )
+        self.tablebase_path_text.pack(fill=tk.X)
+        
         # Divider
         tk.Frame(sf_frame, height=1, bg=self.accent_color).pack(fill=tk.X, pady=10)
         
@@ -712,7 +841,7 @@ class ModernGUI:
             anchor=tk.W
         ).pack(side=tk.LEFT)
         
-        self.cpu_threads = tk.IntVar(value=1)
+        self.cpu_threads = tk.IntVar(value=2)
         cpu_entry = tk.Entry(
             cpu_frame,
             textvariable=self.cpu_threads,
@@ -724,6 +853,33 @@ class ModernGUI:
             insertbackground=self.text_primary
         )
         cpu_entry.pack(side=tk.LEFT, padx=5)
+        
+        # Analysis engines
+        pool_frame = tk.Frame(sf_frame, bg=self.bg_secondary)
+        pool_frame.pack(fill=tk.X, pady=3)
+        
+        tk.Label(
+            pool_frame,
+            text="Analysis Engines:",
+            font=("Segoe UI", 9),
+            bg=self.bg_secondary,
+            fg=self.text_secondary,
+            width=13,
+            anchor=tk.W
+        ).pack(side=tk.LEFT)
+        
+        self.analysis_engines = tk.IntVar(value=1)
+        pool_entry = tk.Entry(
+            pool_frame,
+            textvariable=self.analysis_engines,
+            font=("Segoe UI", 9),
+            bg=self.bg_tertiary,
+            fg=self.text_primary,
+            width=8,
+            relief=tk.FLAT,
+            insertbackground=self.text_primary
+        )
+        pool_entry.pack(side=tk.LEFT, padx=5)
 
     def create_misc_section(self, parent):
         """Create miscellaneous settings section"""
@@ -899,8 +1055,19 @@ Press 3 - Make Move (Manual Mode)"""
         self.exit = True
         if self.stockfish_bot_process and self.stockfish_bot_process.is_alive():
             self.stockfish_bot_process.kill()
+            # Its mapping of the position store only goes away with the process
+            self.stockfish_bot_process.join()
         if self.overlay_screen_process and self.overlay_screen_process.is_alive():
             self.overlay_screen_process.kill()
+        self.close_overlay_channel()
+        if self.engine_pool_manager is not None:
+            self.engine_pool_manager.shutdown()
+        # No bot has the position store open anymore
+        if os.path.exists(POSITION_STORE_PATH + ".journal"):
+            try:
+                position_store.compact(POSITION_STORE_PATH)
+            except OSError as e:
+                print(f"Cannot compact the position store: {e}")
         self.master.destroy()
 
     def process_checker_thread(self):
@@ -932,56 +1099,117 @@ Press 3 - Make Move (Manual Mode)"""
     def process_communicator_thread(self):
         """Handle communication with Stockfish Bot process"""
         while not self.exit:
+            # Sleep until a bot is started
+            if not self.stockfish_bot_pipe_ready.wait(0.5):
+                continue
+            pipe = self.stockfish_bot_pipe
+            if pipe is None:
+                self.stockfish_bot_pipe_ready.clear()
+                # A bot started between the check and the clear has already set the event,
+                # its pipe is assigned before that, so look once more
+                pipe = self.stockfish_bot_pipe
+                if pipe is None:
+                    continue
+
+            # Block until the bot sends a frame of messages
             try:
-                if self.stockfish_bot_pipe is not None and self.stockfish_bot_pipe.poll():
-                    data = self.stockfish_bot_pipe.recv()
-                    
-                    if data == "START":
-                        self.clear_tree()
-                        self.match_moves = []
-                        self.status_text["text"] = "RUNNING"
-                        self.start_button["text"] = "STOP BOT"
-                        self.start_button["bg"] = self.error_color
-                        self.start_button["state"] = "normal"
-                        self.start_button["command"] = self.on_stop_button_listener
-                        
-                    elif data == "RESTART":
-                        self.restart_after_stopping = True
-                        self.stockfish_bot_pipe.send("DELETE")
-                        
-                    elif data.startswith("S_MOVE"):
-                        move = data[6:]
-                        self.match_moves.append(move)
-                        self.insert_move(move)
-                        self.tree.yview_moveto(1)
-                        
-                    elif data.startswith("M_MOVE"):
-                        moves = data[6:].split(",")
-                        self.match_moves += moves
-                        self.set_moves(moves)
-                        self.tree.yview_moveto(1)
-                        
-                    elif data.startswith("EVAL|"):
-                        parts = data.split("|")
-                        if len(parts) >= 6:
-                            eval_str, wdl_str, material_str, bot_acc, opp_acc = parts[1:6]
-                            self.update_evaluation_display(eval_str, wdl_str, material_str, bot_acc, opp_acc)
-                            
-                    elif data.startswith("ERR_"):
-                        error_messages = {
-                            "ERR_EXE": "Stockfish path is not valid!",
-                            "ERR_PERM": "Stockfish executable lacks permissions!",
-                            "ERR_BOARD": "Cannot find chess board!",
-                            "ERR_COLOR": "Cannot determine player color!",
-                            "ERR_MOVES": "Cannot find moves list!",
-                            "ERR_GAMEOVER": "Game has already finished!"
-                        }
-                        msg = error_messages.get(data[:12], "Unknown error occurred")
-                        tk.messagebox.showerror("Error", msg)
-                        
+                frame = pipe.recv_bytes()
+            except (EOFError, OSError):
+                # The bot is gone
+                if self.stockfish_bot_pipe is pipe:
+                    self.stockfish_bot_pipe = None
+                continue
+
+            try:
+                for message_type, values in protocol.decode(frame):
+                    self.handle_bot_message(pipe, message_type, values)
             except (BrokenPipeError, OSError):
-                self.stockfish_bot_pipe = None
-            time.sleep(0.1)
+                if self.stockfish_bot_pipe is pipe:
+                    self.stockfish_bot_pipe = None
+
+    def handle_bot_message(self, pipe, message_type, values):
+        """Apply one message of the Stockfish Bot process"""
+        if message_type == protocol.START:
+            self.clear_tree()
+            self.match_moves = []
+            self.status_text["text"] = "RUNNING"
+            self.start_button["text"] = "STOP BOT"
+            self.start_button["bg"] = self.error_color
+            self.start_button["state"] = "normal"
+            self.start_button["command"] = self.on_stop_button_listener
+            
+        elif message_type == protocol.RESTART:
+            self.restart_after_stopping = True
+            pipe.send_bytes(protocol.encode(protocol.DELETE))
+            
+        elif message_type == protocol.MOVE:
+            move = values[0]
+            self.match_moves.append(move)
+            self.insert_move(move)
+            self.tree.yview_moveto(1)
+            
+        elif message_type == protocol.MOVES:
+            moves = values[0]
+            self.match_moves += moves
+            self.set_moves(moves)
+            self.tree.yview_moveto(1)
+            
+        elif message_type == protocol.EVAL:
+            self.update_evaluation_display(*self.format_evaluation(values))
+
+        elif message_type == protocol.ACCURACY:
+            bot_acc, opp_acc = (format_accuracy(protocol.accuracy_from_value(value)) for value in values)
+            self.bot_acc_text["text"] = bot_acc
+            self.opp_acc_text["text"] = opp_acc
+
+        elif message_type == protocol.PONDER:
+            hits, total = values
+            self.ponder_text["text"] = f"{hits / total * 100:.1f}% ({hits}/{total})"
+
+        elif message_type == protocol.WEBDRIVER:
+            ply_count, ply_time, game_count, game_time = values
+            self.webdriver_text["text"] = (
+                f"{ply_count} in {ply_time * 1000:.0f} ms this ply, {game_count} in {game_time:.1f} s this game"
+            )
+                
+        elif message_type == protocol.ERROR:
+            error_messages = {
+                protocol.ERROR_EXE: "Stockfish path is not valid!",
+                protocol.ERROR_PERM: "Stockfish executable lacks permissions!",
+                protocol.ERROR_BOARD: "Cannot find chess board!",
+                protocol.ERROR_COLOR: "Cannot determine player color!",
+                protocol.ERROR_MOVES: "Cannot find moves list!",
+                protocol.ERROR_GAMEOVER: "Game has already finished!"
+            }
+            msg = error_messages.get(values[0], "Unknown error occurred")
+            tk.messagebox.showerror("Error", msg)
+
+    def format_evaluation(self, values):
+        """Turn the values of an EVAL message into the texts of the evaluation display"""
+        score_kind, score, win, draw, loss, material, bot_acc, opp_acc = values
+
+        if score_kind == protocol.SCORE_BOOK:
+            eval_str = "Book"
+        elif score_kind == protocol.SCORE_CP:
+            eval_str = f"{score / 100:.2f}"
+        else:
+            eval_str = f"M{score}"
+
+        total = win + draw + loss
+        if total > 0:
+            wdl_str = f"{win / total * 100:.1f}/{draw / total * 100:.1f}/{loss / total * 100:.1f}"
+        else:
+            wdl_str = "?/?/?"
+
+        material_str = f"+{material}" if material > 0 else str(material)
+
+        return (
+            eval_str,
+            wdl_str,
+            material_str,
+            format_accuracy(protocol.accuracy_from_value(bot_acc)),
+            format_accuracy(protocol.accuracy_from_value(opp_acc)),
+        )
 
     def keypress_listener_thread(self):
         """Listen for keyboard shortcuts"""
@@ -1050,19 +1278,32 @@ Press 3 - Make Move (Manual Mode)"""
             tk.messagebox.showerror("Error", "Mouseless mode only works on Lichess")
             return
         
+        if self.analysis_engines.get() < 1:
+            tk.messagebox.showerror("Error", "Analysis Engines must be at least 1")
+            return
+        
+        if self.cpu_threads.get() <= self.analysis_engines.get():
+            tk.messagebox.showerror("Error", "CPU Threads must be more than Analysis Engines, each of them takes a thread")
+            return
+        
+        if self.memory.get() < 16 * (self.analysis_engines.get() + 1):
+            tk.messagebox.showerror("Error", "Memory must be at least 16 MB for every engine")
+            return
+        
         parent_conn, child_conn = multiprocess.Pipe()
         self.stockfish_bot_pipe = parent_conn
-        st_ov_queue = multiprocess.Queue()
+        self.overlay_channel = OverlayChannel()
         
         # Get delay range based on time control
         delay_min, delay_max = self.get_delay_range()
+        main_threads, main_hash, _, _ = self.get_engine_budget()
         
         self.stockfish_bot_process = StockfishBot(
             self.chrome_url,
             self.chrome_session_id,
             self.website.get(),
             child_conn,
-            st_ov_queue,
+            self.overlay_channel,
             self.stockfish_path,
             self.enable_manual_mode.get(),
             self.enable_mouseless_mode.get(),
@@ -1073,21 +1314,65 @@ Press 3 - Make Move (Manual Mode)"""
             self.slow_mover.get(),
             self.skill_level.get(),
             self.stockfish_depth.get(),
-            self.memory.get(),
-            self.cpu_threads.get(),
+            main_hash,
+            main_threads,
             self.enable_random_delay.get(),
             delay_min,
-            delay_max
+            delay_max,
+            self.get_engine_pool(),
+            self.analysis_cache,
+            POSITION_STORE_PATH,
+            self.opening_book_path,
+            self.tablebase_path,
+            self.enable_time_management.get(),
+            TRACE_DIRECTORY if self.enable_tracing.get() else None
         )
         self.stockfish_bot_process.start()
+        # Only the bot writes to its end, so the GUI gets EOFError once the bot is gone
+        child_conn.close()
+        self.stockfish_bot_pipe_ready.set()
         
-        self.overlay_screen_process = multiprocess.Process(target=run, args=(st_ov_queue,))
+        self.overlay_screen_process = multiprocess.Process(target=run, args=(self.overlay_channel,))
         self.overlay_screen_process.start()
         
         self.running = True
         self.start_button["text"] = "Starting..."
         self.start_button["state"] = "disabled"
 
+    def get_engine_budget(self):
+        """Split the CPU Threads and Memory settings, returns (main threads, main hash, pool threads, pool hash)
+
+        Every analysis engine gets a thread and 16 MB, the main engine gets
+        the rest, so all the engines together stay within the settings.
+        """
+        size = self.analysis_engines.get()
+        return self.cpu_threads.get() - size, self.memory.get() - 16 * size, size, 16 * size
+
+    def get_engine_pool(self):
+        """Start the shared engine pool and analysis cache, or restart them if the settings changed"""
+        key = (self.stockfish_path, self.analysis_engines.get(), self.cpu_threads.get(), self.memory.get())
+        if self.engine_pool_manager is not None and self.engine_pool_key != key:
+            self.engine_pool_manager.shutdown()
+            self.engine_pool_manager = None
+            self.engine_pool = None
+            self.analysis_cache = None
+        
+        if self.engine_pool_manager is None:
+            size = self.analysis_engines.get()
+            _, _, threads, hash_mb = self.get_engine_budget()
+            try:
+                self.engine_pool_manager, self.engine_pool = start_engine_pool_server(
+                    self.stockfish_path, size, threads, hash_mb
+                )
+                self.analysis_cache = self.engine_pool_manager.get_analysis_cache()
+                self.engine_pool_key = key
+            except Exception:
+                # The bot falls back to an engine and a cache of its own
+                self.engine_pool_manager = None
+                self.engine_pool = None
+                self.analysis_cache = None
+        return self.engine_pool
+
     def on_stop_button_listener(self):
         """Handle bot stop"""
         if self.stockfish_bot_process is not None:
@@ -1097,6 +1382,7 @@ Press 3 - Make Move (Manual Mode)"""
             if self.stockfish_bot_process.is_alive():
                 self.stockfish_bot_process.kill()
             self.stockfish_bot_process = None
+        self.close_overlay_channel()
         
         if self.stockfish_bot_pipe is not None:
             self.stockfish_bot_pipe.close()
@@ -1111,6 +1397,8 @@ Press 3 - Make Move (Manual Mode)"""
         self.material_text["text"] = "-"
         self.bot_acc_text["text"] = "-"
         self.opp_acc_text["text"] = "-"
+        self.ponder_text["text"] = "-"
+        self.webdriver_text["text"] = "-"
         
         if not self.restart_after_stopping:
             self.start_button["text"] = "START BOT"
@@ -1121,6 +1409,13 @@ Press 3 - Make Move (Manual Mode)"""
             self.restart_after_stopping = False
             self.on_start_button_listener()
 
+    def close_overlay_channel(self):
+        """Free the shared memory of the overlay channel"""
+        if self.overlay_channel is not None:
+            self.overlay_channel.close()
+            self.overlay_channel.unlink()
+            self.overlay_channel = None
+
     def on_topmost_check_button_listener(self):
         """Toggle window topmost status"""
         self.master.attributes("-topmost", self.enable_topmost.get() == 1)
@@ -1166,6 +1461,34 @@ Press 3 - Make Move (Manual Mode)"""
             self.stockfish_path_text.bind("<Enter>", lambda e: self.show_tooltip(e, f))
             self.stockfish_path_text.bind("<Leave>", lambda e: self.hide_tooltip())
     
+    def on_select_opening_book_button_listener(self):
+        """Select Polyglot opening book"""
+        f = filedialog.askopenfilename(
+            title="Select Opening Book",
+            filetypes=[
+                ("Polyglot books", "*.bin"),
+                ("All files", "*.*")
+            ]
+        )
+        if f:
+            self.opening_book_path = f
+            self.opening_book_path_text["text"] = f"✓ {os.path.basename(f)}"
+            self.opening_book_path_text["fg"] = self.success_color
+            
+            self.opening_book_path_text.bind("<Enter>", lambda e: self.show_tooltip(e, f))
+            self.opening_book_path_text.bind("<Leave>", lambda e: self.hide_tooltip())
+    
+    def on_select_tablebase_button_listener(self):
+        """Select Syzygy tablebase directory"""
+        d = filedialog.askdirectory(title="Select Syzygy Tablebase Folder")
+        if d:
+            self.tablebase_path = d
+            self.tablebase_path_text["text"] = f"✓ {os.path.basename(d)}"
+            self.tablebase_path_text["fg"] = self.success_color
+            
+            self.tablebase_path_text.bind("<Enter>", lambda e: self.show_tooltip(e, d))
+            self.tablebase_path_text.bind("<Leave>", lambda e: self.hide_tooltip())
+    
     def show_tooltip(self, event, text):
         """Show tooltip with full path"""
         try:
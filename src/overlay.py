@@ -1,15 +1,21 @@
 import math
 import sys
-import threading
-from PyQt6.QtCore import Qt, QPoint, QRect
-from PyQt6.QtGui import QBrush, QColor, QPainter, QPen, QGuiApplication, QPolygon, QFont
+from PyQt6.QtCore import Qt, QPoint, QRect, QTimer
+from PyQt6.QtGui import QBrush, QColor, QPainter, QPen, QGuiApplication, QPolygon, QFont, QRegion
 from PyQt6.QtWidgets import QApplication, QWidget
 
 
+# The refresh rate assumed if the screen doesn't report one
+DEFAULT_REFRESH_RATE = 60
+
+
 class OverlayScreen(QWidget):
-    def __init__(self, stockfish_queue):
+    def __init__(self, overlay_channel):
         super().__init__()
-        self.stockfish_queue = stockfish_queue
+        self.overlay_channel = overlay_channel
+        self.channel_sequence = None
+        self.arrows_version = None
+        self.eval_version = None
 
         # Set the window to be the size of the screen
         self.screen = QGuiApplication.screens()[0]
@@ -21,8 +27,11 @@ class OverlayScreen(QWidget):
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint)
 
-        # A list of QPolygon objects containing the points of the arrows
+        # A list of QPolygon objects containing the points of the arrows,
+        # the polygons by their start and end points and the screen area they cover
         self.arrows = []
+        self.arrow_polygons = {}
+        self.arrows_rect = QRect()
         
         # Evaluation bar properties
         self.eval_bar_visible = False
@@ -41,40 +50,56 @@ class OverlayScreen(QWidget):
         self.eval_bar_y = (self.height() - self.eval_bar_height) // 2  # Default y position
         self.eval_bar_margin = 15  # Margin between board and eval bar
 
-        # Start the message queue thread
-        self.message_queue_thread = threading.Thread(target=self.message_queue_thread)
-        self.message_queue_thread.start()
+        # The rectangles, colors and text of the eval bar, computed when its inputs change
+        self.eval_bar_geometry = None
+
+        # Read the channel on the GUI thread once per screen refresh, so however
+        # many updates the bot writes there is at most one repaint per frame
+        refresh_rate = self.screen.refreshRate() or DEFAULT_REFRESH_RATE
+        self.channel_timer = QTimer(self)
+        self.channel_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.channel_timer.timeout.connect(self.read_channel)
+        self.channel_timer.start(max(1, int(1000 / refresh_rate)))
 
-    def message_queue_thread(self):
+    def read_channel(self):
         """
-        This thread is used to receive messages from the stockfish message queue
-        and update the arrows
+        Apply the latest arrows and eval the bot wrote into the overlay channel,
+        only the parts that changed since the last read, and repaint once
         Args:
             None
         Returns:
             None
         """
 
-        while True:
-            message = self.stockfish_queue.get()
-            if isinstance(message, list):
-                # Arrow data
-                self.set_arrows(message)
-            elif isinstance(message, dict) and "eval" in message:
-                # Evaluation data
-                eval_value = message["eval"]
-                eval_type = message.get("eval_type", "cp")
-                
-                # Update board position if provided
-                if "board_position" in message:
-                    self.board_position = message["board_position"]
-                    self.update_eval_bar_position()
-                
-                # Update bot color if provided
-                if "is_white" in message:
-                    self.is_white = message["is_white"]
-                
-                self.update_eval_bar(eval_value, eval_type)
+        sequence, state = self.overlay_channel.read()
+        if sequence == self.channel_sequence:
+            return
+        self.channel_sequence = sequence
+
+        # Only the areas covered by what changed, before and after, are repainted
+        dirty_region = QRegion()
+
+        if state.arrows_version != self.arrows_version:
+            self.arrows_version = state.arrows_version
+            dirty_region = dirty_region.united(self.arrows_rect)
+            self.set_arrows(state.arrows)
+            dirty_region = dirty_region.united(self.arrows_rect)
+
+        if state.eval_version != self.eval_version and state.eval_visible:
+            self.eval_version = state.eval_version
+            dirty_region = dirty_region.united(self.get_eval_bar_rect())
+
+            # Update board position if known
+            if state.board_position is not None:
+                self.board_position = state.board_position
+                self.update_eval_bar_position()
+
+            self.is_white = state.is_white
+            self.update_eval_bar(state.eval_value, state.eval_type)
+            dirty_region = dirty_region.united(self.get_eval_bar_rect())
+
+        if not dirty_region.isEmpty():
+            self.update(dirty_region)
     
     def update_eval_bar_position(self):
         """
@@ -84,11 +109,11 @@ class OverlayScreen(QWidget):
             return
             
         # Position the eval bar to the left of the board with a small margin
-        self.eval_bar_x = self.board_position['x'] - self.eval_bar_width - self.eval_bar_margin
+        self.eval_bar_x = int(self.board_position['x']) - self.eval_bar_width - self.eval_bar_margin
         
         # Make the eval bar the exact same height as the board
-        self.eval_bar_height = self.board_position['height']
-        self.eval_bar_y = self.board_position['y']
+        self.eval_bar_height = int(self.board_position['height'])
+        self.eval_bar_y = int(self.board_position['y'])
             
     def update_eval_bar(self, eval_value, eval_type="cp"):
         """
@@ -106,8 +131,8 @@ class OverlayScreen(QWidget):
             self.eval_text = f"{eval_value:.2f}"
         else:  # mate
             self.eval_text = f"M{eval_value}"
-        
-        self.update()
+
+        self.update_eval_bar_geometry()
 
     def set_arrows(self, arrows):
         """
@@ -119,36 +144,49 @@ class OverlayScreen(QWidget):
             None
         """
 
+        # Polygons of arrows that are still shown are reused
+        arrow_polygons = {}
         self.arrows = []
+        self.arrows_rect = QRect()
         for arrow in arrows:
-            poly = self.get_arrow_polygon(
-                QPoint(arrow[0][0], arrow[0][1]),
-                QPoint(arrow[1][0], arrow[1][1])
-            )
+            key = (tuple(arrow[0]), tuple(arrow[1]))
+            poly = self.arrow_polygons.get(key)
+            if poly is None:
+                poly = self.get_arrow_polygon(
+                    QPoint(arrow[0][0], arrow[0][1]),
+                    QPoint(arrow[1][0], arrow[1][1])
+                )
+                if poly is None:
+                    continue
+            arrow_polygons[key] = poly
             self.arrows.append(poly)
-        self.update()
+            self.arrows_rect = self.arrows_rect.united(poly.boundingRect().adjusted(-1, -1, 1, 1))
+        self.arrow_polygons = arrow_polygons
 
     def paintEvent(self, event):
         super().paintEvent(event)
         painter = QPainter(self)
         
+        # Only draw what lies in the area being repainted
+        region = event.region()
+
         # Draw arrows
         painter.setPen(QPen(Qt.GlobalColor.red, 1, Qt.PenStyle.NoPen))
         painter.setBrush(QBrush(QColor(255, 0, 0, 122), Qt.BrushStyle.SolidPattern))
-        for arrow in self.arrows:
-            painter.drawPolygon(arrow)
+        if region.intersects(self.arrows_rect):
+            for arrow in self.arrows:
+                painter.drawPolygon(arrow)
         
         # Draw evaluation bar if visible
-        if self.eval_bar_visible:
+        if self.eval_bar_visible and region.intersects(self.get_eval_bar_rect()):
             self.draw_eval_bar(painter)
         
         painter.end()
     
-    def draw_eval_bar(self, painter):
+    def update_eval_bar_geometry(self):
         """
-        Draw the evaluation bar on the screen
-        Args:
-            painter: QPainter object
+        Compute the rectangles, colors and text of the evaluation bar, they are
+        kept until the eval, the board position or the bot color change
         """
         # Bar border
         border_rect = QRect(
@@ -157,9 +195,6 @@ class OverlayScreen(QWidget):
             self.eval_bar_width + 4, 
             self.eval_bar_height + 4
         )
-        painter.setPen(QPen(QColor(40, 40, 40), 2))
-        painter.setBrush(QBrush(QColor(40, 40, 40, 180)))
-        painter.drawRect(border_rect)
         
         # The eval value is already from the player's perspective
         # (positive = advantage for the player, negative = advantage for opponent)
@@ -185,39 +220,24 @@ class OverlayScreen(QWidget):
         player_height = int(self.eval_bar_height * player_advantage)
         opponent_height = self.eval_bar_height - player_height
         
-        # Draw opponent's section (top)
+        # Opponent's section (top)
         opponent_rect = QRect(
             self.eval_bar_x, 
             self.eval_bar_y, 
             self.eval_bar_width, 
             opponent_height
         )
-        painter.setPen(Qt.PenStyle.NoPen)
-        painter.setBrush(QBrush(top_color))
-        painter.drawRect(opponent_rect)
         
-        # Draw player's section (bottom)
+        # Player's section (bottom)
         player_rect = QRect(
             self.eval_bar_x, 
             self.eval_bar_y + opponent_height, 
             self.eval_bar_width, 
             player_height
         )
-        painter.setBrush(QBrush(bottom_color))
-        painter.drawRect(player_rect)
         
-        # Draw the center line
+        # The center line
         center_y = self.eval_bar_y + (self.eval_bar_height // 2)
-        painter.setPen(QPen(QColor(100, 100, 100, 150), 1))
-        painter.drawLine(
-            self.eval_bar_x, 
-            center_y, 
-            self.eval_bar_x + self.eval_bar_width, 
-            center_y
-        )
-        
-        # Draw evaluation text
-        painter.setFont(QFont("Arial", 11, QFont.Weight.Bold))
         
         # Format the display text
         display_text = self.eval_text
@@ -232,6 +252,56 @@ class OverlayScreen(QWidget):
             20
         )
         
+        self.eval_bar_geometry = (
+            border_rect, top_color, opponent_rect, bottom_color, player_rect, center_y, text_rect, display_text
+        )
+
+    def get_eval_bar_rect(self):
+        """
+        Get the screen area the evaluation bar covers
+        Returns:
+            A QRect, empty if the bar isn't shown
+        """
+        if not self.eval_bar_visible or self.eval_bar_geometry is None:
+            return QRect()
+        # The border pen is 2 pixels wide, half of it lies outside the border rectangle
+        return self.eval_bar_geometry[0].adjusted(-1, -1, 1, 1)
+
+    def draw_eval_bar(self, painter):
+        """
+        Draw the evaluation bar on the screen
+        Args:
+            painter: QPainter object
+        """
+        border_rect, top_color, opponent_rect, bottom_color, player_rect, center_y, text_rect, display_text = \
+            self.eval_bar_geometry
+
+        # Bar border
+        painter.setPen(QPen(QColor(40, 40, 40), 2))
+        painter.setBrush(QBrush(QColor(40, 40, 40, 180)))
+        painter.drawRect(border_rect)
+        
+        # Draw opponent's section (top)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QBrush(top_color))
+        painter.drawRect(opponent_rect)
+        
+        # Draw player's section (bottom)
+        painter.setBrush(QBrush(bottom_color))
+        painter.drawRect(player_rect)
+        
+        # Draw the center line
+        painter.setPen(QPen(QColor(100, 100, 100, 150), 1))
+        painter.drawLine(
+            self.eval_bar_x, 
+            center_y, 
+            self.eval_bar_x + self.eval_bar_width, 
+            center_y
+        )
+        
+        # Draw evaluation text
+        painter.setFont(QFont("Arial", 11, QFont.Weight.Bold))
+        
         # Draw text background
         painter.setBrush(QBrush(QColor(60, 60, 60, 180)))
         painter.setPen(Qt.PenStyle.NoPen)
@@ -283,16 +353,16 @@ class OverlayScreen(QWidget):
             print(e)
 
 
-def run(stockfish_queue):
+def run(overlay_channel):
     """
     This function is used to run the overlay
     Args:
-        stockfish_queue: The message queue used to communicate with the stockfish thread
+        overlay_channel: The OverlayChannel the stockfish bot writes the overlay state into
     Returns:
         None
     """
 
     app = QApplication(sys.argv)
-    overlay = OverlayScreen(stockfish_queue)
+    overlay = OverlayScreen(overlay_channel)
     overlay.show()
     app.exec()
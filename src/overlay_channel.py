@@ -0,0 +1,141 @@
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+# The most arrows the overlay can show at once
+MAX_ARROWS = 4
+
+# Sequence number of the seqlock, odd while a write is in progress
+SEQUENCE = struct.Struct("<I")
+
+# arrows version, eval version, arrow count, arrows as (start x, start y, end x, end y),
+# eval visible, eval is mate, eval value, is white, board rect known, board x, y, width, height
+STATE = struct.Struct("<IIB" + "i" * (4 * MAX_ARROWS) + "??d??4d")
+
+
+class OverlayState:
+    """What the overlay shows: the arrows, the eval bar and the board rectangle
+
+    Each kind of update has its own version number, so the overlay can
+    tell which part changed since it last looked.
+    """
+
+    def __init__(self):
+        self.arrows_version = 0
+        self.eval_version = 0
+        self.arrows = []
+        self.eval_visible = False
+        self.eval_type = "cp"
+        self.eval_value = 0.0
+        self.is_white = True
+        self.board_position = None
+
+    def pack_into(self, buffer, offset):
+        coordinates = []
+        for (start_x, start_y), (end_x, end_y) in self.arrows[:MAX_ARROWS]:
+            coordinates += [start_x, start_y, end_x, end_y]
+        coordinates += [0] * (4 * MAX_ARROWS - len(coordinates))
+
+        board = self.board_position or {"x": 0, "y": 0, "width": 0, "height": 0}
+        STATE.pack_into(
+            buffer, offset, self.arrows_version, self.eval_version, min(len(self.arrows), MAX_ARROWS), *coordinates,
+            self.eval_visible, self.eval_type == "mate", self.eval_value, self.is_white,
+            self.board_position is not None, board["x"], board["y"], board["width"], board["height"],
+        )
+
+    @classmethod
+    def unpack_from(cls, buffer, offset):
+        values = STATE.unpack_from(buffer, offset)
+        arrows_version, eval_version, arrow_count = values[:3]
+        coordinates = values[3:3 + 4 * MAX_ARROWS]
+        eval_visible, is_mate, eval_value, is_white, has_board, x, y, width, height = values[3 + 4 * MAX_ARROWS:]
+
+        state = cls()
+        state.arrows_version = arrows_version
+        state.eval_version = eval_version
+        state.arrows = [
+            ((coordinates[i], coordinates[i + 1]), (coordinates[i + 2], coordinates[i + 3]))
+            for i in range(0, 4 * arrow_count, 4)
+        ]
+        state.eval_visible = eval_visible
+        state.eval_type = "mate" if is_mate else "cp"
+        state.eval_value = int(eval_value) if is_mate else eval_value
+        state.is_white = is_white
+        if has_board:
+            state.board_position = {"x": x, "y": y, "width": width, "height": height}
+        return state
+
+
+class OverlayChannel:
+    """The overlay's current state in a fixed-layout block of shared memory
+
+    The bot process is the only writer and the overlay reads the block on
+    its own timer, so nothing is queued up and nothing is pickled. A
+    seqlock keeps the reader from using a half-written state: the writer
+    makes the sequence number odd while it writes, and the reader tries
+    again if the number was odd or changed during its read.
+    """
+
+    def __init__(self, name=None):
+        size = SEQUENCE.size + STATE.size
+        if name is None:
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+            SEQUENCE.pack_into(self._memory.buf, 0, 0)
+            OverlayState().pack_into(self._memory.buf, SEQUENCE.size)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+            # The creator frees the block, the resource tracker of this process mustn't do it on exit
+            if hasattr(resource_tracker, "unregister") and shared_memory._USE_POSIX:
+                resource_tracker.unregister(self._memory._name, "shared_memory")
+
+        # The writer's copy of the state, the block is always written as a whole
+        self._state = OverlayState()
+
+    # Other processes attach to the block by its name
+    def __getstate__(self):
+        return {"name": self._memory.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["name"])
+
+    def _sequence(self):
+        return SEQUENCE.unpack_from(self._memory.buf, 0)[0]
+
+    def _write(self):
+        sequence = self._sequence()
+        SEQUENCE.pack_into(self._memory.buf, 0, sequence + 1)
+        self._state.pack_into(self._memory.buf, SEQUENCE.size)
+        SEQUENCE.pack_into(self._memory.buf, 0, (sequence + 2) & 0xFFFFFFFF)
+
+    def set_arrows(self, arrows):
+        """Show the arrows, given as ((start x, start y), (end x, end y)) screen points"""
+        self._state.arrows = list(arrows)
+        self._state.arrows_version = (self._state.arrows_version + 1) & 0xFFFFFFFF
+        self._write()
+
+    def set_eval(self, eval_value, eval_type, is_white, board_position=None):
+        """Show the eval bar, next to the board if its rectangle (x, y, width, height dict) is given"""
+        self._state.eval_visible = True
+        self._state.eval_value = eval_value
+        self._state.eval_type = eval_type
+        self._state.is_white = is_white
+        if board_position is not None:
+            self._state.board_position = board_position
+        self._state.eval_version = (self._state.eval_version + 1) & 0xFFFFFFFF
+        self._write()
+
+    def read(self):
+        """Returns the sequence number and the OverlayState of the last complete write"""
+        while True:
+            sequence = self._sequence()
+            if sequence % 2 == 1:
+                continue
+            state = OverlayState.unpack_from(self._memory.buf, SEQUENCE.size)
+            if self._sequence() == sequence:
+                return sequence, state
+
+    def close(self):
+        self._memory.close()
+
+    def unlink(self):
+        """Free the block, only called by the process that created it"""
+        self._memory.unlink()
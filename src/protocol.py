@@ -0,0 +1,84 @@
+import math
+import struct
+
+# Message type IDs
+START = 1  # The bot is running
+RESTART = 2  # The bot wants to be restarted, answered with DELETE
+DELETE = 3  # Sent by the GUI, the bot can be stopped
+MOVE = 4  # A move was made: SAN
+MOVES = 5  # The moves on the board when the bot started: list of SAN
+EVAL = 6  # See EVAL_PAYLOAD
+ACCURACY = 7  # Bot accuracy, opponent accuracy
+PONDER = 8  # Ponder hits, ponder searches
+ERROR = 9  # One of the error codes below
+WEBDRIVER = 10  # WebDriver commands and seconds since the last report, commands and seconds in the game
+
+# Error codes
+ERROR_EXE = 1
+ERROR_PERM = 2
+ERROR_BOARD = 3
+ERROR_COLOR = 4
+ERROR_MOVES = 5
+ERROR_GAMEOVER = 6
+
+# Kinds of evaluation in an EVAL message
+SCORE_CP = 0
+SCORE_MATE = 1
+SCORE_BOOK = 2
+
+# Every message starts with its type ID and the size of the payload that follows
+HEADER = struct.Struct("<BH")
+
+# Score kind, score (centipawns or moves to mate, from the bot's point of view),
+# win/draw/loss per mille, material balance, bot accuracy, opponent accuracy
+EVAL_PAYLOAD = struct.Struct("<Bi3Hhdd")
+
+PAYLOADS = {
+    EVAL: EVAL_PAYLOAD,
+    ACCURACY: struct.Struct("<dd"),
+    PONDER: struct.Struct("<II"),
+    ERROR: struct.Struct("<B"),
+    WEBDRIVER: struct.Struct("<IdId"),
+}
+
+
+def encode(message_type, *values):
+    """Returns the bytes of one message, the bytes of several messages can be sent as one frame"""
+    if message_type == MOVE:
+        payload = values[0].encode()
+    elif message_type == MOVES:
+        payload = ",".join(values[0]).encode()
+    elif message_type in PAYLOADS:
+        payload = PAYLOADS[message_type].pack(*values)
+    else:
+        payload = b""
+    return HEADER.pack(message_type, len(payload)) + payload
+
+
+def decode(frame):
+    """Yields the (message type, values) of every message in a frame"""
+    offset = 0
+    while offset < len(frame):
+        message_type, size = HEADER.unpack_from(frame, offset)
+        offset += HEADER.size
+        payload = frame[offset:offset + size]
+        offset += size
+
+        if message_type == MOVE:
+            values = (payload.decode(),)
+        elif message_type == MOVES:
+            values = (payload.decode().split(","),)
+        elif message_type in PAYLOADS:
+            values = PAYLOADS[message_type].unpack(payload)
+        else:
+            values = ()
+        yield message_type, values
+
+
+def accuracy_value(accuracy):
+    """Accuracies are sent as NaN while there is none"""
+    return math.nan if accuracy is None else accuracy
+
+
+def accuracy_from_value(value):
+    return None if math.isnan(value) else value
@@ -1,7 +1,7 @@
 # stockfish_bot.py - Updated with time control delay ranges
 
 import multiprocess
-from stockfish import Stockfish
+import threading
 import pyautogui
 import random
 import time
@@ -11,7 +11,19 @@ import chess
 import re
 from grabbers.chesscom_grabber import ChesscomGrabber
 from grabbers.lichess_grabber import LichessGrabber
-from utilities import char_to_num
+from engines.uci_engine import UciEngine, EngineError
+from engines.accuracy_worker import AccuracyWorker
+from engines.engine_pool import EnginePool
+from engines.analysis_cache import AnalysisCache
+from engines.position_store import PositionStore
+from engines.opening_book import OpeningBook
+from engines.tablebase import Tablebase
+from engines.time_manager import TimeManager
+from engines.analysis_result import AnalysisResult
+from accuracy import AccuracyTracker
+from game_state import GameState, material_balance
+import protocol
+from tracing import Tracer
 import keyboard
 
 
@@ -22,7 +34,7 @@ class StockfishBot(multiprocess.Process):
         chrome_session_id,
         website,
         pipe,
-        overlay_queue,
+        overlay_channel,
         stockfish_path,
         enable_manual_mode,
         enable_mouseless_mode,
@@ -38,13 +50,20 @@ class StockfishBot(multiprocess.Process):
         enable_random_delay,
         delay_min=1,  # New parameter for minimum delay
         delay_max=20,  # New parameter for maximum delay
+        engine_pool=None,  # Shared pool for the background analysis, a local one is used if None
+        analysis_cache=None,  # Shared cache of earlier searches, kept across games and restarts
+        position_store_path=None,  # File of the results of earlier sessions, not used if None
+        opening_book_path=None,  # Polyglot book played from before searching, not used if None
+        tablebase_path=None,  # Directory of Syzygy tablebases for the endgame, not used if None
+        enable_time_management=False,  # Budget the searches by the clocks instead of the depth alone
+        trace_directory=None,  # Directory the latency trace of every game is written to, no tracing if None
     ):
         multiprocess.Process.__init__(self)
         self.chrome_url = chrome_url
         self.chrome_session_id = chrome_session_id
         self.website = website
         self.pipe = pipe
-        self.overlay_queue = overlay_queue
+        self.overlay_channel = overlay_channel
         self.stockfish_path = stockfish_path
         self.enable_manual_mode = enable_manual_mode
         self.enable_mouseless_mode = enable_mouseless_mode
@@ -61,22 +80,32 @@ class StockfishBot(multiprocess.Process):
         self.enable_random_delay = enable_random_delay
         self.delay_min = delay_min  # Store delay range
         self.delay_max = delay_max
+        self.engine_pool = engine_pool
+        self.analysis_cache = AnalysisCache(parent=analysis_cache)
+        self.position_store_path = position_store_path
+        self.position_store = None
+        self.opening_book_path = opening_book_path
+        self.opening_book = None
+        self.tablebase_path = tablebase_path
+        self.tablebase = None
+        self.time_manager = None
+        if enable_time_management:
+            # Besides the search every move costs the mouse movement and the random delay
+            move_overhead = mouse_latency + 0.3
+            if enable_random_delay:
+                move_overhead += (delay_min + delay_max) / 2
+            self.time_manager = TimeManager(move_overhead)
+        self.low_on_time = False
+        self.trace_directory = trace_directory
+        self.tracer = Tracer()
         self.is_white = None
+        self.pipe_lock = threading.Lock()
+        self.accuracy = AccuracyTracker()
 
     def move_to_screen_pos(self, move):
-        """Convert chess move to screen coordinates"""
-        canvas_x_offset, canvas_y_offset = self.grabber.get_top_left_corner()
-        board_x = canvas_x_offset + self.grabber.get_board().location["x"]
-        board_y = canvas_y_offset + self.grabber.get_board().location["y"]
-        square_size = self.grabber.get_board().size['width'] / 8
-        
-        if self.is_white:
-            x = board_x + square_size * (char_to_num(move[0]) - 1) + square_size / 2
-            y = board_y + square_size * (8 - int(move[1])) + square_size / 2
-        else:
-            x = board_x + square_size * (8 - char_to_num(move[0])) + square_size / 2
-            y = board_y + square_size * (int(move[1]) - 1) + square_size / 2
-        return x, y
+        """Convert a square name to screen coordinates"""
+        geometry = self.grabber.get_board_geometry(self.is_white)
+        return geometry.square_center(chess.parse_square(move[0:2]))
 
     def get_move_pos(self, move):
         """Get start and end positions for a move"""
@@ -86,6 +115,8 @@ class StockfishBot(multiprocess.Process):
 
     def make_move(self, move):
         """Execute a chess move on screen"""
+        # The page may have been scrolled or resized since the last poll, during the search or the delay
+        self.grabber.refresh_board_geometry(self.is_white)
         start_pos, end_pos = self.get_move_pos(move)
         pyautogui.moveTo(start_pos[0], start_pos[1])
         time.sleep(self.mouse_latency)
@@ -94,21 +125,33 @@ class StockfishBot(multiprocess.Process):
         # Handle pawn promotion
         if len(move) == 5:
             time.sleep(0.1)
-            end_pos_x = None
-            end_pos_y = None
-            if move[4] == "n":
-                end_pos_x, end_pos_y = self.move_to_screen_pos(move[2] + str(int(move[3]) - 1))
-            elif move[4] == "r":
-                end_pos_x, end_pos_y = self.move_to_screen_pos(move[2] + str(int(move[3]) - 2))
-            elif move[4] == "b":
-                end_pos_x, end_pos_y = self.move_to_screen_pos(move[2] + str(int(move[3]) - 3))
+            # The promotion menu runs from the promotion square towards the middle of the board
+            step = -1 if move[3] == "8" else 1
+            menu_index = {"q": 0, "n": 1, "r": 2, "b": 3}[move[4]]
+            end_pos_x, end_pos_y = self.move_to_screen_pos(move[2] + str(int(move[3]) + step * menu_index))
             pyautogui.moveTo(x=end_pos_x, y=end_pos_y)
             pyautogui.click(button='left')
 
+    def send_message(self, *messages):
+        """Send encoded messages to the GUI as one frame, the accuracy worker thread sends too"""
+        with self.tracer.span("pipe_send"), self.pipe_lock:
+            self.pipe.send_bytes(b"".join(messages))
+
+    def send_accuracy(self):
+        """Send the current accuracies to the GUI"""
+        bot_color = chess.WHITE if self.is_white else chess.BLACK
+        self.send_message(protocol.encode(
+            protocol.ACCURACY,
+            protocol.accuracy_value(self.accuracy.accuracy(bot_color)),
+            protocol.accuracy_value(self.accuracy.accuracy(not bot_color)),
+        ))
+
     def wait_for_gui_to_delete(self):
         """Wait for GUI confirmation"""
-        while self.pipe.recv() != "DELETE":
-            pass
+        while True:
+            for message_type, _ in protocol.decode(self.pipe.recv_bytes()):
+                if message_type == protocol.DELETE:
+                    return
 
     def human_delay(self):
         """Add human-like delay between moves"""
@@ -119,18 +162,21 @@ class StockfishBot(multiprocess.Process):
     def go_to_next_puzzle(self):
         """Navigate to next puzzle"""
         self.grabber.click_puzzle_next()
-        self.pipe.send("RESTART")
+        self.send_message(protocol.encode(protocol.RESTART))
         self.wait_for_gui_to_delete()
 
     def find_new_online_match(self):
         """Start new online match"""
         time.sleep(2)
         self.grabber.click_game_next()
-        self.pipe.send("RESTART")
+        self.send_message(protocol.encode(protocol.RESTART))
         self.wait_for_gui_to_delete()
 
     def run(self):
         """Main bot execution loop"""
+        # The ring buffer is only allocated in the bot process
+        self.tracer = Tracer(self.trace_directory)
+
         # Initialize grabber
         if self.website == "chesscom":
             self.grabber = ChesscomGrabber(self.chrome_url, self.chrome_session_id)
@@ -138,6 +184,7 @@ class StockfishBot(multiprocess.Process):
             self.grabber = LichessGrabber(self.chrome_url, self.chrome_session_id)
 
         self.grabber.reset_moves_list()
+        self.grabber.command_stats.tracer = self.tracer
         
         # Initialize Stockfish
         parameters = {
@@ -148,88 +195,110 @@ class StockfishBot(multiprocess.Process):
             "Skill Level": self.skill_level,
         }
         
+        engine = None
         try:
-            stockfish = Stockfish(path=self.stockfish_path, depth=self.stockfish_depth, parameters=parameters)
+            engine = UciEngine(self.stockfish_path, parameters)
+            engine_pool = self.engine_pool
+            if engine_pool is None:
+                engine_pool = EnginePool(self.stockfish_path, 1, 1, 16)
         except PermissionError:
-            self.pipe.send("ERR_PERM")
+            self.send_message(protocol.encode(protocol.ERROR, protocol.ERROR_PERM))
             return
-        except OSError:
-            self.pipe.send("ERR_EXE")
+        except (OSError, EngineError):
+            # Also an executable that isn't a UCI engine or exits right away
+            if engine is not None:
+                engine.quit()
+            self.send_message(protocol.encode(protocol.ERROR, protocol.ERROR_EXE))
             return
 
+        # Finds the opponent's best moves for the accuracy in the background
+        session_id = f"bot-{os.getpid()}"
+        accuracy_worker = AccuracyWorker(engine_pool, session_id, self.accuracy, self.send_accuracy)
+        accuracy_worker.start()
+
         try:
+            if self.position_store_path is not None:
+                self.position_store = PositionStore(self.position_store_path)
+            if self.opening_book_path is not None:
+                try:
+                    self.opening_book = OpeningBook(self.opening_book_path)
+                except OSError as e:
+                    print(f"Cannot open the opening book: {e}")
+            if self.tablebase_path is not None:
+                try:
+                    self.tablebase = Tablebase(self.tablebase_path)
+                except OSError as e:
+                    print(f"Cannot open the tablebases: {e}")
+
             # Verify board element exists
             self.grabber.update_board_elem()
             if self.grabber.get_board() is None:
-                self.pipe.send("ERR_BOARD")
+                self.send_message(protocol.encode(protocol.ERROR, protocol.ERROR_BOARD))
                 return
             
             # Determine player color
             self.is_white = self.grabber.is_white()
             if self.is_white is None:
-                self.pipe.send("ERR_COLOR")
+                self.send_message(protocol.encode(protocol.ERROR, protocol.ERROR_COLOR))
                 return
             
             # Get starting position
             move_list = self.grabber.get_move_list()
             if move_list is None:
-                self.pipe.send("ERR_MOVES")
+                self.send_message(protocol.encode(protocol.ERROR, protocol.ERROR_MOVES))
                 return
             
             # Check if game is already over
             score_pattern = r"([0-9]+)\-([0-9]+)"
             if len(move_list) > 0 and re.match(score_pattern, move_list[-1]):
-                self.pipe.send("ERR_GAMEOVER")
+                self.send_message(protocol.encode(protocol.ERROR, protocol.ERROR_GAMEOVER))
                 return
             
             # Initialize board state
-            board = chess.Board()
-            for move in move_list:
-                board.push_san(move)
-            move_list_uci = [move.uci() for move in board.move_stack]
-            stockfish.set_position(move_list_uci)
-
-            # Track moves for accuracy calculation
-            white_moves = []
-            white_best_moves = []
-            black_moves = []
-            black_best_moves = []
-
-            # Send initial evaluation
-            self.send_eval_data(stockfish, board)
-            self.pipe.send("START")
-            
+            game = GameState(move_list)
+            board = game.board
+            game.send_to(engine)
+
+            # The reply being pondered on and the ponder statistics
+            ponder_move = None
+            ponder_hits = 0
+            ponder_total = 0
+
+            # Search the starting position and send the initial evaluation
+            analysis = self.search(engine, game)
+            messages = [protocol.encode(protocol.START)]
             if len(move_list) > 0:
-                self.pipe.send("M_MOVE" + ",".join(move_list))
+                messages.append(protocol.encode(protocol.MOVES, move_list))
+            self.send_eval_data(analysis, board, *messages)
 
             # Main game loop
             while True:
                 # Bot's turn
                 if (self.is_white and board.turn == chess.WHITE) or (not self.is_white and board.turn == chess.BLACK):
+                    # Search the position, unless it was already searched
+                    if analysis is None:
+                        with self.tracer.span("search"):
+                            analysis = self.search(engine, game)
+                        self.send_eval_data(analysis, board)
+
                     # Calculate move
-                    move = None
+                    move = analysis.best_move
                     move_count = len(board.move_stack)
                     
                     # Bongcloud opening logic
                     if self.bongcloud and move_count <= 3:
-                        bongcloud_moves = ["e2e3", "e7e6", "e1e2", "e8e7"]
-                        move = bongcloud_moves[move_count]
-                        if not board.is_legal(chess.Move.from_uci(move)):
-                            move = stockfish.get_best_move()
-                    else:
-                        move = stockfish.get_best_move()
+                        bongcloud_move = ["e2e3", "e7e6", "e1e2", "e8e7"][move_count]
+                        if board.is_legal(chess.Move.from_uci(bongcloud_move)):
+                            move = bongcloud_move
 
                     # Store best move for accuracy
-                    if board.turn == chess.WHITE:
-                        white_best_moves.append(move)
-                    else:
-                        black_best_moves.append(move)
+                    best_move = move
 
                     # Manual mode handling
                     self_moved = False
                     if self.enable_manual_mode:
                         move_start_pos, move_end_pos = self.get_move_pos(move)
-                        self.overlay_queue.put([
+                        self.overlay_channel.set_arrows([
                             (
                                 (int(move_start_pos[0]), int(move_start_pos[1])),
                                 (int(move_end_pos[0]), int(move_end_pos[1])),
@@ -239,58 +308,49 @@ class StockfishBot(multiprocess.Process):
                         while True:
                             if keyboard.is_pressed("3"):
                                 break
+                            # Wait briefly in the page so the key stays responsive
+                            self.grabber.wait_for_move_list_change(0.05)
                             if len(move_list) != len(self.grabber.get_move_list()):
                                 self_moved = True
                                 move_list = self.grabber.get_move_list()
                                 move_san = move_list[-1]
-                                move = board.parse_san(move_san).uci()
-                                
-                                if board.turn == chess.WHITE:
-                                    white_moves.append(move)
-                                else:
-                                    black_moves.append(move)
-                                    
-                                board.push_uci(move)
-                                stockfish.make_moves_from_current_position([move])
+                                mover = board.turn
+                                move = game.push_san(move_san)
+                                self.accuracy.add(mover, move, best_move)
+                                game.send_to(engine)
                                 break
 
                     if not self_moved:
-                        # Add human-like delay
-                        self.human_delay()
+                        # Add human-like delay, unless the clock is about to run out
+                        if not self.low_on_time:
+                            with self.tracer.span("human_delay"):
+                                self.human_delay()
                         
-                        move_san = board.san(
-                            chess.Move(
-                                chess.parse_square(move[0:2]),
-                                chess.parse_square(move[2:4]),
-                            )
-                        )
-                        
-                        if board.turn == chess.WHITE:
-                            white_moves.append(move)
-                        else:
-                            black_moves.append(move)
-                            
-                        board.push_uci(move)
-                        stockfish.make_moves_from_current_position([move])
+                        self.accuracy.add(board.turn, move, best_move)
+                        move_san = game.push_uci(move)
+                        game.send_to(engine)
                         move_list.append(move_san)
                         
                         if self.enable_mouseless_mode and not self.grabber.is_game_puzzles():
-                            self.grabber.make_mouseless_move(move, move_count + 1)
+                            with self.tracer.span("make_mouseless_move"):
+                                self.grabber.make_mouseless_move(move, move_count + 1)
                         else:
-                            self.make_move(move)
+                            with self.tracer.span("make_move"):
+                                self.make_move(move)
 
-                    self.overlay_queue.put([])
+                    self.overlay_channel.set_arrows([])
                     
-                    # Send evaluation update
-                    self.send_eval_data(
-                        stockfish,
-                        board,
-                        white_moves,
-                        white_best_moves,
-                        black_moves,
-                        black_best_moves,
-                    )
-                    self.pipe.send("S_MOVE" + move_san)
+                    # Send evaluation update, the search of our move already evaluated the position
+                    # after it, unless a different move (Bongcloud or the user's own) was played
+                    played_analysis = analysis
+                    if move != analysis.best_move:
+                        with self.tracer.span("search"):
+                            played_analysis = self.search(engine, game)
+                    self.send_eval_data(played_analysis, board, protocol.encode(protocol.MOVE, move_san))
+
+                    # Think on the opponent's time about the reply we expect
+                    ponder_move = self.start_pondering(engine, game, analysis, move)
+                    analysis = None
                     
                     # Check for checkmate
                     if board.is_checkmate():
@@ -304,7 +364,9 @@ class StockfishBot(multiprocess.Process):
 
                 # Wait for opponent's move
                 previous_move_list = move_list.copy()
+                wait_start = time.perf_counter_ns()
                 while True:
+                    poll_start = time.perf_counter_ns()
                     if self.grabber.is_game_over():
                         if self.enable_non_stop_puzzles and self.grabber.is_game_puzzles():
                             self.go_to_next_puzzle()
@@ -313,59 +375,76 @@ class StockfishBot(multiprocess.Process):
                         return
 
                     new_move_list = self.grabber.get_move_list()
+                    self.tracer.record("poll", poll_start, time.perf_counter_ns())
                     if new_move_list is None:
                         return
 
                     # Check for new game
                     if len(new_move_list) == 0 and len(move_list) > 0:
+                        if ponder_move is not None:
+                            engine.stop()
+                            ponder_move = None
                         move_list = []
-                        board = chess.Board()
-                        stockfish.set_position([])
-                        white_moves = []
-                        white_best_moves = []
-                        black_moves = []
-                        black_best_moves = []
+                        game.reset()
+                        board = game.board
+                        engine.new_game()
+                        game.send_to(engine)
+                        self.accuracy.reset()
+                        self.end_game_trace()
                         self.is_white = self.grabber.is_white()
-                        self.pipe.send("RESTART")
+                        self.send_message(protocol.encode(protocol.RESTART))
                         self.wait_for_gui_to_delete()
-                        self.send_eval_data(stockfish, board)
-                        self.pipe.send("START")
+                        analysis = self.search(engine, game)
+                        self.send_eval_data(analysis, board, protocol.encode(protocol.START))
                         break
 
                     # Opponent made a move
                     if len(new_move_list) > len(previous_move_list):
                         move_list = new_move_list
+                        self.tracer.record("wait_for_opponent", wait_start, time.perf_counter_ns())
                         break
 
+                    # Sleep inside the page until the move list changes instead of polling
+                    self.grabber.wait_for_move_list_change()
+
                 # Process opponent's move
                 move = move_list[-1]
-                prev_board = board.copy()
-                board.push_san(move)
-                move_uci = prev_board.parse_san(move).uci()
-
-                # Store move for accuracy
-                if prev_board.turn == chess.WHITE:
-                    white_moves.append(move_uci)
+                mover = board.turn
+                with self.tracer.span("parse_san"):
+                    move_uci = board.parse_san(move).uci()
+
+                if ponder_move is not None and move_uci == ponder_move:
+                    # The expected reply, the ponder search carries on as our search
+                    # and it was the best move as far as our search could tell
+                    engine.ponderhit()
+                    ponder_hits += 1
+                    self.accuracy.add(mover, move_uci, ponder_move)
+                    game.push_san(move)
                 else:
-                    black_moves.append(move_uci)
-
-                # Get best move for comparison
-                best_move = stockfish.get_best_move_time(300)
-                if prev_board.turn == chess.WHITE:
-                    white_best_moves.append(best_move)
-                else:
-                    black_best_moves.append(best_move)
-
-                stockfish.make_moves_from_current_position([str(board.peek())])
-                self.send_eval_data(
-                    stockfish,
-                    board,
-                    white_moves,
-                    white_best_moves,
-                    black_moves,
-                    black_best_moves,
-                )
-                self.pipe.send("S_MOVE" + move)
+                    if ponder_move is not None:
+                        # Wrong guess, drop the ponder search
+                        engine.stop()
+
+                    # The best move for comparison is found in the background
+                    entry = self.accuracy.add(mover, move_uci)
+                    accuracy_worker.submit(*game.uci_position(), entry)
+                    game.push_san(move)
+                    game.send_to(engine)
+
+                messages = [protocol.encode(protocol.MOVE, move), self.encode_webdriver_report()]
+                if ponder_move is not None:
+                    ponder_total += 1
+                    messages.append(protocol.encode(protocol.PONDER, ponder_hits, ponder_total))
+                self.send_message(*messages)
+
+                # The evaluation is sent once our search of the new position finishes
+                analysis = None
+                if ponder_move is not None and move_uci == ponder_move:
+                    with self.tracer.span("ponder_search"):
+                        analysis = engine.wait_for_result()
+                    self.cache_analysis(game, analysis)
+                    self.send_eval_data(analysis, board)
+                ponder_move = None
 
                 if board.is_checkmate():
                     if self.enable_non_stop_puzzles and self.grabber.is_game_puzzles():
@@ -379,127 +458,155 @@ class StockfishBot(multiprocess.Process):
             exc_type, exc_obj, exc_tb = sys.exc_info()
             fname = os.path.split(exc_tb.tb_frame.f_code.co_filename)[1]
             print(exc_type, fname, exc_tb.tb_lineno)
-
-    def send_eval_data(
-        self,
-        stockfish,
-        board,
-        white_moves=None,
-        white_best_moves=None,
-        black_moves=None,
-        black_best_moves=None,
-    ):
-        """Send evaluation and statistics to GUI"""
+        finally:
+            self.end_game_trace()
+            accuracy_worker.close()
+            if engine_pool is self.engine_pool:
+                engine_pool.end_session(session_id)
+            else:
+                engine_pool.close()
+            engine.quit()
+            if self.position_store is not None:
+                self.position_store.close()
+            if self.opening_book is not None:
+                self.opening_book.close()
+            if self.tablebase is not None:
+                self.tablebase.close()
+
+    def encode_webdriver_report(self):
+        """Encode the WebDriver commands sent since the last report and during the game"""
+        command_stats = self.grabber.command_stats
+        return protocol.encode(protocol.WEBDRIVER, *command_stats.take_report(), *command_stats.totals())
+
+    def end_game_trace(self):
+        """Write the trace of the game with its WebDriver commands and start on the next game"""
+        self.tracer.end_game({"webdriver": self.grabber.command_stats.summary()})
+        self.grabber.command_stats.reset()
+
+    def search(self, engine, game):
+        """Search the current position, unless the book, the tablebases or the cache already know it"""
+        if self.opening_book is not None:
+            book_move = self.opening_book.choose_move(game.board)
+            if book_move is not None:
+                analysis = AnalysisResult(game.board.turn)
+                analysis.best_move = book_move
+                return analysis
+
+        if self.tablebase is not None:
+            analysis = self.tablebase.probe(game.board)
+            if analysis is not None:
+                return analysis
+
+        if self.skill_level == 20:
+            analysis = self.analysis_cache.get(game.zobrist_key, self.stockfish_depth)
+            if analysis is None and self.position_store is not None:
+                analysis = self.position_store.get(game.zobrist_key, self.stockfish_depth, game.board.turn)
+                if analysis is not None:
+                    self.analysis_cache.put(game.zobrist_key, analysis)
+            if analysis is not None:
+                return analysis
+
+        movetime = self.get_movetime(game.board)
+        with self.tracer.span("engine_search"):
+            analysis = engine.search(depth=self.stockfish_depth, movetime=movetime)
+        self.cache_analysis(game, analysis)
+        return analysis
+
+    def get_movetime(self, board):
+        """Returns the time budget of a search in milliseconds, None to search by depth alone"""
+        if self.time_manager is None:
+            return None
+        clocks = self.grabber.get_clocks()
+        if clocks is None:
+            return None
+
+        white_time, black_time, increment = clocks
+        remaining = white_time if self.is_white else black_time
+        self.low_on_time = self.time_manager.is_emergency(remaining)
+        return self.time_manager.movetime(board, remaining, increment)
+
+    def cache_analysis(self, game, analysis):
+        """Keep a search of the current position for later games"""
+        # Below full strength the engine picks its move at random, that choice shouldn't stick
+        if self.skill_level == 20:
+            self.analysis_cache.put(game.zobrist_key, analysis)
+            if self.position_store is not None:
+                self.position_store.put(game.zobrist_key, analysis)
+
+    def start_pondering(self, engine, game, analysis, played_move):
+        """Start a ponder search on the reply the engine expects, returns that reply"""
+        if analysis.ponder_move is None or played_move != analysis.best_move:
+            return None
+        if chess.Move.from_uci(analysis.ponder_move) not in game.board.legal_moves:
+            return None
+
+        fen, moves = game.uci_position()
+        engine.set_position(fen, moves + [analysis.ponder_move])
+        # The budget also counts the time spent pondering, so a hit late in the opponent's think moves at once
+        engine.start_search(depth=self.stockfish_depth, movetime=self.get_movetime(game.board), ponder=True)
+        return analysis.ponder_move
+
+    def send_eval_data(self, analysis, board, *messages):
+        """Send evaluation and statistics to GUI, in one frame with the given messages"""
+        with self.tracer.span("send_eval_data"):
+            self._send_eval_data(analysis, board, *messages)
+
+    def _send_eval_data(self, analysis, board, *messages):
+        sent = False
         try:
-            eval_data = stockfish.get_evaluation()
-            eval_type = eval_data["type"]
-            eval_value = eval_data["value"]
-
-            # Convert to player's perspective
-            player_perspective_eval_value = eval_value
+            # The engine scores from the side to move, convert it to the player's perspective
+            eval_type = analysis.score_type or "cp"
+            player_perspective_eval_value = analysis.white_score() or 0
             if not self.is_white:
-                player_perspective_eval_value = -eval_value
+                player_perspective_eval_value = -player_perspective_eval_value
 
-            # Get WDL statistics
-            try:
-                wdl_stats = stockfish.get_wdl_stats()
-            except Exception:
-                wdl_stats = [0, 0, 0]
+            # Get WDL statistics from the bot's perspective
+            wdl_stats = analysis.wdl_for(self.is_white) or [0, 0, 0]
 
             # Calculate material advantage
-            material = self.calculate_material_advantage(board)
-
-            # Calculate accuracy
-            white_accuracy = "-"
-            black_accuracy = "-"
-            
-            if white_moves and white_best_moves and len(white_moves) > 0 and len(white_moves) == len(white_best_moves):
-                matches = sum(1 for a, b in zip(white_moves, white_best_moves) if a == b)
-                white_accuracy = f"{matches / len(white_moves) * 100:.1f}%"
-
-            if black_moves and black_best_moves and len(black_moves) > 0 and len(black_moves) == len(black_best_moves):
-                matches = sum(1 for a, b in zip(black_moves, black_best_moves) if a == b)
-                black_accuracy = f"{matches / len(black_moves) * 100:.1f}%"
+            material = material_balance(board)
 
-            # Format evaluation
-            if eval_type == "cp":
-                eval_str = f"{player_perspective_eval_value / 100:.2f}"
+            # Determine bot and opponent accuracies
+            bot_color = chess.WHITE if self.is_white else chess.BLACK
+            bot_accuracy = self.accuracy.accuracy(bot_color)
+            opponent_accuracy = self.accuracy.accuracy(not bot_color)
+
+            # Book moves come without an evaluation
+            if not analysis.has_score():
+                score_kind = protocol.SCORE_BOOK
+                eval_value_decimal = 0
+            elif eval_type == "cp":
+                score_kind = protocol.SCORE_CP
                 eval_value_decimal = player_perspective_eval_value / 100
             else:
-                eval_str = f"M{player_perspective_eval_value}"
+                score_kind = protocol.SCORE_MATE
                 eval_value_decimal = player_perspective_eval_value
 
-            # Format WDL
-            total = sum(wdl_stats)
-            if total > 0:
-                is_bot_turn = (self.is_white and board.turn == chess.WHITE) or (
-                    not self.is_white and board.turn == chess.BLACK
-                )
-
-                if is_bot_turn:
-                    win_pct = wdl_stats[0] / total * 100
-                    draw_pct = wdl_stats[1] / total * 100
-                    loss_pct = wdl_stats[2] / total * 100
-                else:
-                    win_pct = wdl_stats[2] / total * 100
-                    draw_pct = wdl_stats[1] / total * 100
-                    loss_pct = wdl_stats[0] / total * 100
-
-                wdl_str = f"{win_pct:.1f}/{draw_pct:.1f}/{loss_pct:.1f}"
-            else:
-                wdl_str = "?/?/?"
-
-            # Determine bot and opponent accuracies
-            bot_accuracy = white_accuracy if self.is_white else black_accuracy
-            opponent_accuracy = black_accuracy if self.is_white else white_accuracy
-
             # Send to GUI
-            data = f"EVAL|{eval_str}|{wdl_str}|{material}|{bot_accuracy}|{opponent_accuracy}"
-            self.pipe.send(data)
+            self.send_message(
+                protocol.encode(
+                    protocol.EVAL, score_kind, player_perspective_eval_value, *wdl_stats, material,
+                    protocol.accuracy_value(bot_accuracy), protocol.accuracy_value(opponent_accuracy),
+                ),
+                *messages
+            )
+            sent = True
 
             # Send to overlay
-            overlay_data = {
-                "eval": eval_value_decimal,
-                "eval_type": eval_type,
-            }
-
-            board_elem = self.grabber.get_board()
-            if board_elem:
-                canvas_x_offset, canvas_y_offset = self.grabber.get_top_left_corner()
-                overlay_data["board_position"] = {
-                    "x": canvas_x_offset + board_elem.location["x"],
-                    "y": canvas_y_offset + board_elem.location["y"],
-                    "width": board_elem.size["width"],
-                    "height": board_elem.size["height"],
+            board_position = None
+            if self.grabber.get_board():
+                geometry = self.grabber.get_board_geometry(self.is_white)
+                board_position = {
+                    "x": geometry.x,
+                    "y": geometry.y,
+                    "width": geometry.width,
+                    "height": geometry.height,
                 }
 
-            overlay_data["is_white"] = self.is_white
-            self.overlay_queue.put(overlay_data)
+            self.overlay_channel.set_eval(eval_value_decimal, eval_type, self.is_white, board_position)
 
         except Exception as e:
             print(f"Error sending evaluation: {e}")
-
-    def calculate_material_advantage(self, board):
-        """Calculate material balance"""
-        piece_values = {
-            chess.PAWN: 1,
-            chess.KNIGHT: 3,
-            chess.BISHOP: 3,
-            chess.ROOK: 5,
-            chess.QUEEN: 9,
-        }
-
-        white_material = 0
-        black_material = 0
-
-        for piece_type in piece_values:
-            white_material += len(board.pieces(piece_type, chess.WHITE)) * piece_values[piece_type]
-            black_material += len(board.pieces(piece_type, chess.BLACK)) * piece_values[piece_type]
-
-        advantage = white_material - black_material
-        if advantage > 0:
-            return f"+{advantage}"
-        elif advantage < 0:
-            return str(advantage)
-        else:
-            return "0"
+            # The other messages still have to arrive
+            if not sent and messages:
+                self.send_message(*messages)
@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+
+# Spans kept per game, the oldest are overwritten once the buffer is full
+DEFAULT_CAPACITY = 32768
+
+# Trace file formats
+CHROME = "chrome"  # Chrome trace events, opened in chrome://tracing or Perfetto
+JSONL = "jsonl"  # One span per line
+
+
+class _NullSpan:
+    """The span of a disabled tracer, shared by every call"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("_tracer", "_name", "_start")
+
+    def __init__(self, tracer, name):
+        self._tracer = tracer
+        self._name = name
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._tracer.record(self._name, self._start, time.perf_counter_ns())
+        return False
+
+
+class Tracer:
+    """Records how long the named steps of a ply take
+
+    Spans go into a ring buffer allocated up front, so recording one costs
+    two clock reads and a few list writes. A tracer without a directory is
+    disabled and hands out a span that does nothing. Every game is written
+    to its own file in the directory once it ends.
+    """
+
+    def __init__(self, directory=None, trace_format=CHROME, capacity=DEFAULT_CAPACITY):
+        self.directory = directory
+        self.enabled = directory is not None
+        self.trace_format = trace_format
+        self._capacity = capacity if self.enabled else 0
+        self._names = [None] * self._capacity
+        self._starts = [0] * self._capacity
+        self._ends = [0] * self._capacity
+        self._threads = [0] * self._capacity
+        self._count = 0
+        self._games = 0
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        """Returns a context manager that records the time spent in it under the name"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, start, end):
+        """Record a span from its perf_counter_ns timestamps"""
+        if not self.enabled:
+            return
+        thread = threading.get_ident()
+        with self._lock:
+            index = self._count % self._capacity
+            self._names[index] = name
+            self._starts[index] = start
+            self._ends[index] = end
+            self._threads[index] = thread
+            self._count += 1
+
+    def spans(self):
+        """Returns the recorded (name, start, end, thread) spans, oldest first"""
+        with self._lock:
+            first = max(0, self._count - self._capacity)
+            indices = [i % self._capacity for i in range(first, self._count)]
+            return [(self._names[i], self._starts[i], self._ends[i], self._threads[i]) for i in indices]
+
+    def end_game(self, summary=None):
+        """Write the spans of the game that ended to a new file and start over, returns its path
+
+        The summary, a dict of statistics of the game, is written along with the spans
+        """
+        if not self.enabled:
+            return None
+        spans = self.spans()
+        with self._lock:
+            self._count = 0
+        if not spans:
+            return None
+
+        self._games += 1
+        extension = ".jsonl" if self.trace_format == JSONL else ".json"
+        path = os.path.join(self.directory, f"trace-{os.getpid()}-{self._games}{extension}")
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, "w") as file:
+            if self.trace_format == JSONL:
+                write_jsonl(file, spans, summary)
+            else:
+                write_chrome_trace(file, spans, summary)
+        return path
+
+
+def _thread_numbers(spans):
+    # Small numbers read better on the timeline than thread idents
+    numbers = {}
+    for _, _, _, thread in spans:
+        numbers.setdefault(thread, len(numbers) + 1)
+    return numbers
+
+
+def write_chrome_trace(file, spans, summary=None):
+    """Write spans as complete ("X") Chrome trace events, timestamps in microseconds"""
+    pid = os.getpid()
+    threads = _thread_numbers(spans)
+    events = [
+        {
+            "name": name,
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": (end - start) / 1000,
+            "pid": pid,
+            "tid": threads[thread],
+        }
+        for name, start, end, thread in spans
+    ]
+    trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+    if summary is not None:
+        trace["otherData"] = summary
+    json.dump(trace, file)
+
+
+def write_jsonl(file, spans, summary=None):
+    """Write one {name, start_ns, duration_ns, thread} object per line, then the {summary} if given"""
+    threads = _thread_numbers(spans)
+    for name, start, end, thread in spans:
+        file.write(json.dumps({
+            "name": name,
+            "start_ns": start,
+            "duration_ns": end - start,
+            "thread": threads[thread],
+        }) + "\n")
+    if summary is not None:
+        file.write(json.dumps({"summary": summary}) + "\n")
@@ -2,12 +2,6 @@ from selenium.webdriver.remote.webdriver import WebDriver
 from selenium import webdriver
 
 
-# Converts a chess character into an int
-# Examples: a -> 1, b -> 2, h -> 8, etc.
-def char_to_num(char):
-    return ord(char) - ord("a") + 1
-
-
 # Attaches to a running webdriver
 # Returns the webdriver
 # Taken from https://stackoverflow.com/a/48194907/5868441